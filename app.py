@@ -1,23 +1,114 @@
 import streamlit as st
-import json
 import time
-from hunter_info import save_account_info  # Import the function from hunter_info.py
-from email_generator import run_email_generator  # Import your email generator
-from email_verification import run_email_verifier  # Import your email verifier
-
-# Read account info from JSON file
-def read_account_info():
-    with open('account_info.json', 'r') as f:
-        return json.load(f)
-
-# Function to refresh the usage values
-def refresh_usage_values():
-    # Updates the Hunter.io usage stats in account_info.json
-    save_account_info()  
-    account_info = read_account_info()
-    used_searches = account_info.get('used_searches', 'N/A')
-    used_verifications = account_info.get('used_verifications', 'N/A')
-    return used_searches, used_verifications
+from hunter_info import UsageCache  # Background-refreshed Hunter.io usage stats
+from jobs import JobManager  # Background job runner, one job per spreadsheet at a time
+
+# The job modules (gspread, fuzzy matching, Hunter client...) are imported
+# inside the button handlers so the page paints without loading them
+
+# One usage cache (and refresh thread) shared by every session of the app,
+# over the same key pool the verification jobs use
+@st.cache_resource
+def get_usage_cache():
+    from key_pool import get_key_pool
+    return UsageCache(get_key_pool())
+
+# Function to read the usage values, summed over every Hunter.io API key,
+# without waiting on the Hunter.io API
+def read_usage_values():
+    values, updated_at, error = get_usage_cache().snapshot()
+    used_searches = values.get('used_searches')
+    used_verifications = values.get('used_verifications')
+    remaining = values.get('remaining_verifications')
+    keys = values.get('keys', 1)
+    exhausted = values.get('keys_exhausted', 0)
+    if remaining is None:
+        remaining = 'N/A'
+    elif keys > 1:
+        remaining = f"{remaining} across {keys} keys ({exhausted} exhausted)"
+    if updated_at is None:
+        updated = 'not loaded yet'
+    else:
+        updated = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(updated_at))
+    if error:
+        updated += f' (last refresh failed: {error})'
+    return ('N/A' if used_searches is None else used_searches,
+            'N/A' if used_verifications is None else used_verifications,
+            remaining, updated)
+
+# One job runner shared by every session, so a reload or a second user sees
+# the job already running instead of starting an overlapping one
+@st.cache_resource
+def get_job_manager():
+    return JobManager()
+
+# Jobs are locked per spreadsheet (or local storage file)
+def storage_key():
+    from storage import get_storage
+    return get_storage().key
+
+# Function to start a job in the background; the page keeps rendering while it runs
+def start_job(name, run, spends_credits=False):
+    usage_cache = get_usage_cache()
+
+    # Metrics accumulate over the app's lifetime; the report files (if
+    # EMAILGEN_METRICS_JSON / EMAILGEN_METRICS_PROM are set) follow each job
+    def on_finish(job):
+        from metrics import get_metrics
+        get_metrics().write_reports()
+        if spends_credits:
+            usage_cache.request_refresh()
+
+    job, started = get_job_manager().submit(name, storage_key(), run, on_finish=on_finish)
+    if not started:
+        st.warning(f"{job.name} is already running on this spreadsheet. Showing its progress instead.")
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+# Function to describe a job's progress in one line
+def job_status_text(job):
+    parts = [f"{job.name}: {job.done}" + (f"/{job.total}" if job.total is not None else "") + " rows",
+             f"{job.rate():.1f} rows/s"]
+    eta = job.eta()
+    if job.running and eta is not None:
+        parts.append(f"ETA {format_seconds(eta)}")
+    if 'credits' in job.counts:
+        parts.append(f"{job.counts['credits']} credits used")
+    parts.append(f"{format_seconds(job.elapsed())} elapsed")
+    return " · ".join(parts)
+
+# Latest job for this spreadsheet, polled every second while the page is open.
+# Finished jobs stay here (result and logs) until dismissed.
+@st.fragment(run_every=1)
+def show_job_status(key):
+    manager = get_job_manager()
+    job = manager.latest(key)
+    if job is None:
+        return
+
+    if job.running:
+        st.progress(job.fraction(), text=job_status_text(job))
+    elif job.state == "done":
+        st.success(f"{job.name} completed! {job_status_text(job)}")
+        if job.result:
+            st.write(job.result)
+    else:
+        st.error(f"{job.name} failed: {job.error}")
+
+    out = job.output.getvalue().strip()
+    err = job.errors.getvalue().strip()
+    if out:
+        st.subheader("Logs")
+        st.code(out)
+    if err:
+        st.subheader("Errors")
+        st.code(err)
+
+    if not job.running and st.button('Dismiss', key='dismiss_job'):
+        manager.clear_finished(key)
+        st.rerun()
 
 def main():
     # Apply custom CSS
@@ -99,12 +190,18 @@ def main():
     # Header placeholder for usage stats
     header_placeholder = st.empty()
 
-    # Refresh usage stats once per script run
-    used_searches, used_verifications = refresh_usage_values()
+    # Manual refresh; otherwise the stats are refreshed in the background
+    if st.button('Refresh usage'):
+        get_usage_cache().refresh()
+
+    # Show the last known usage stats straight away
+    used_searches, used_verifications, remaining_verifications, updated = read_usage_values()
     header_placeholder.markdown(f"""
     <!-- Usage Stats -->
     Domain Searches Used: {used_searches}<br>
-    Verifications Used: {used_verifications}
+    Verifications Used: {used_verifications}<br>
+    Verifications Left: {remaining_verifications}<br>
+    <small>Last updated: {updated}</small>
     """, unsafe_allow_html=True)
 
     # Main Content
@@ -114,18 +211,24 @@ def main():
     with col1:
         st.markdown('<div class="section-header">LinkedIn Contact Extraction</div>', unsafe_allow_html=True)
 
+        # Jobs run in the background; their progress is shown below the buttons
         if st.button('Run Email Generator'):
-            with st.spinner('Running Email Generator...'):
-                result = run_email_generator()
-            st.write(result)
-            st.success('Email Generator completed!')
+            from email_generator import run_email_generator
+            start_job('Email Generator', run_email_generator)
 
         if st.button('Run Email Verifier'):
-            with st.spinner('Running Email Verifier...'):
-                # Make sure run_email_verifier() returns a message/string.
-                result = run_email_verifier()
-            st.write(result)
-            st.success('Email Verifier completed!')
+            from email_verification import run_email_verifier
+            start_job('Email Verifier', run_email_verifier, spends_credits=True)
+
+        if st.button('Generate and Verify'):
+            from pipeline import run_pipeline
+            start_job('Generate and Verify', run_pipeline, spends_credits=True)
+
+        if st.button('Learn Email Patterns'):
+            from pattern_learner import learn_patterns
+            start_job('Pattern Learner', learn_patterns)
+
+        show_job_status(storage_key())
 
         st.markdown(
             '<a href="https://docs.google.com/spreadsheets/d/1pNhTLbKGcbmpvCIs6upg3f9RxpOlH1XfKc4bpDDhnFA/edit?usp=sharing">'
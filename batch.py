@@ -0,0 +1,325 @@
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+from metrics import get_metrics, reset_metrics
+from storage import LOCAL_STORAGE_PATH, LocalStorage, get_worksheet, make_storage, to_extract_record, use_storage
+
+# Headless runs of the generator and verifier, e.g. from cron:
+#
+#   python batch.py generate                        # Extract -> Generated on the configured storage
+#   python batch.py verify --concurrency 4          # Generated -> Validation/History
+#   python batch.py --storage local --db run.sqlite3 verify --dry-run
+#   python batch.py generate --input contacts.csv --output generated.csv --chunk-size 5000
+#   python batch.py generate --no-dedup             # also regenerate contacts seen in earlier runs
+#   python batch.py verify --input generated.csv --output validated.csv
+#   python batch.py verify --multi-candidate        # also try the other guesses of unmatched contacts
+#   python batch.py learn --min-confidence 0.9      # History -> new rows in Email Patterns
+#
+# With --input the CSV is streamed chunk by chunk and results are appended to
+# --output as each chunk finishes, so memory stays flat on large files.
+# Progress and timing are written to stdout as JSON lines:
+#   {"event": "progress", "job": "verify", "done": 250, "total": 1000, "rows_per_s": 9.8, "eta_s": 76.5, ...}
+#   {"event": "done", "job": "verify", "result": "...", "elapsed_s": 102.3, "timings": {...}}
+# Everything the jobs print goes to stderr (or nowhere with --quiet).
+# --metrics-json / --metrics-prom also write the run's stage timers, Hunter
+# latency histogram, retry/429 counters and cache hit ratios (see metrics.py).
+
+# Rows per chunk when streaming --input files
+DEFAULT_CHUNK_SIZE = 1000
+
+
+# JSON-lines progress reporter
+class ProgressReport:
+    def __init__(self, job, stream):
+        self.job = job
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.timings = {}
+
+    def emit(self, event, **fields):
+        record = {"event": event, "job": self.job,
+                  "elapsed_s": round(time.perf_counter() - self.started, 3), **fields}
+        print(json.dumps(record), file=self.stream, flush=True)
+
+    # Usable as the `progress(done, total)` callback of the jobs; total may be None when streaming
+    def progress(self, done, total=None, **counts):
+        elapsed = time.perf_counter() - self.started
+        rate = done / elapsed if elapsed else 0.0
+        eta = (total - done) / rate if total is not None and rate else None
+        self.emit("progress", done=done, total=total, rows_per_s=round(rate, 2),
+                  eta_s=None if eta is None else round(eta, 1), **counts)
+
+    # Accumulate the time spent in a named stage
+    @contextlib.contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = round(self.timings.get(stage, 0.0) + time.perf_counter() - start, 3)
+
+
+# Lists of `chunk_size` records (dicts keyed by the header row) from a CSV file
+def read_csv_chunks(path, chunk_size):
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as f:
+        chunk = []
+        for record in csv.DictReader(f):
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+# Appends rows to a CSV file, writing the header first if the file is new or empty
+class CsvAppender:
+    def __init__(self, path, headers):
+        self.file = open(path, "a", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow(headers)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def patterns_sheet(patterns_csv):
+    if patterns_csv:
+        sheet = LocalStorage(":memory:").worksheet("Email Patterns")
+        sheet.import_csv(patterns_csv)
+        return sheet
+    return get_worksheet("Email Patterns")
+
+
+# Contacts CSV -> generated CSV, one chunk at a time. Patterns come from
+# --patterns or the "Email Patterns" tab of the configured storage.
+def generate_file(args, report):
+    from email_generator import (
+        GENERATED_HEADERS,
+        choose_generation_workers,
+        generate_output_rows,
+    )
+    from match_cache import MatchCache
+    from pattern_index import load_pattern_index
+
+    with report.timed("load_patterns"):
+        pattern_index = load_pattern_index(patterns_sheet(args.patterns))
+        # The batch size is unknown while streaming, so size the pool by chunk
+        workers = choose_generation_workers(args.chunk_size, args.workers)
+        matcher = pattern_index.matcher(workers)
+    match_cache = MatchCache(pattern_index.fingerprint)
+    output = None if args.dry_run else CsvAppender(args.output, GENERATED_HEADERS)
+
+    contacts_done = generated = 0
+    try:
+        for chunk in read_csv_chunks(args.input, args.chunk_size):
+            with report.timed("generate"):
+                rows = list(generate_output_rows([to_extract_record(record) for record in chunk],
+                                                 matcher, match_cache, first_index=contacts_done))
+            if output:
+                with report.timed("write"):
+                    output.write(rows)
+            contacts_done += len(chunk)
+            generated += len(rows)
+            report.progress(contacts_done, generated=generated)
+    finally:
+        match_cache.close()
+        if workers > 1:
+            matcher.close()
+        if output:
+            output.close()
+
+    verb = "would be generated" if args.dry_run else f"generated into {args.output}"
+    return (f"{generated} emails {verb} from {contacts_done} contacts. "
+            f"Match cache hit rate: {match_cache.hit_rate():.0%}")
+
+
+# Generated CSV -> verified CSV, one chunk at a time. Addresses verified within
+# the TTL are skipped, the pre-filter settles hopeless ones locally, and every
+# verdict is recorded in the local verification store.
+def verify_file(args, report):
+    from candidate_verifier import is_unmatched, summary as candidate_summary, verify_candidates
+    from email_verification import HUNTER_URL, VALIDATION_HEADERS, refresh_hunter_keys
+    from hunter_verifier import count_lookups, verify_rows
+    from prefilter import PreFilter
+    from verification_store import VerificationStore
+
+    store = VerificationStore()
+    prefilter = PreFilter()
+    output = None if args.dry_run else CsvAppender(args.output, VALIDATION_HEADERS)
+    rows_done = to_verify_count = verified = skipped = credits = 0
+    candidate_stats = Counter()
+    try:
+        keys = None if args.dry_run else refresh_hunter_keys()
+        for chunk in read_csv_chunks(args.input, args.chunk_size):
+            headers = list(chunk[0].keys())
+            email_index = headers.index("email")
+            rows = [[record.get(header) or "" for header in headers] for record in chunk]
+            with report.timed("filter"):
+                rows_to_verify = []
+                for row in rows:
+                    email = row[email_index].strip()
+                    if email and not store.is_fresh(email):
+                        rows_to_verify.append(row)
+                    else:
+                        skipped += 1
+                rows_to_verify, rejected_rows = prefilter.filter_rows(rows_to_verify, email_index)
+                unmatched_rows = []
+                if args.multi_candidate:
+                    unmatched_rows = [row for row in rows_to_verify if is_unmatched(row)]
+                    rows_to_verify = [row for row in rows_to_verify if not is_unmatched(row)]
+            to_verify_count += len(rows_to_verify) + len(unmatched_rows)
+            rows_done += len(rows)
+
+            if not args.dry_run and rejected_rows:
+                store.record_many([(row[email_index].strip(), row[-2], row[-1]) for row in rejected_rows])
+                output.write(rejected_rows)
+            if not args.dry_run and rows_to_verify:
+                with report.timed("verify"):
+                    results = verify_rows(
+                        rows_to_verify, email_index, keys, HUNTER_URL,
+                        concurrency=args.concurrency,
+                        on_result=lambda row: store.record_many([(row[email_index].strip(), row[-2], row[-1])]),
+                        domain_cache=store,
+                    )
+                with report.timed("write"):
+                    output.write(results)
+                verified += len(results)
+                credits += count_lookups(results)
+            if not args.dry_run and unmatched_rows:
+                with report.timed("verify_candidates"):
+                    resolved, stats = verify_candidates(
+                        unmatched_rows, keys, HUNTER_URL, store, prefilter=prefilter,
+                        concurrency=args.concurrency,
+                        on_result=lambda row: store.record_many([(row[email_index].strip(), row[-2], row[-1])]),
+                    )
+                with report.timed("write"):
+                    output.write([result for _, result in resolved])
+                candidate_stats += stats
+                verified += len(resolved)
+                credits += stats["lookups"]
+            report.progress(rows_done, verified=verified, skipped=skipped, credits=credits, saved=prefilter.saved)
+    finally:
+        store.close()
+        if output:
+            output.close()
+
+    get_metrics().increment("verification_store_hits", skipped)
+    get_metrics().increment("verification_store_misses", rows_done - skipped)
+    if args.dry_run:
+        return (f"Dry run: {to_verify_count} of {rows_done} emails would be verified ({skipped} skipped). "
+                f"{prefilter.summary()}")
+    message = f"{verified} emails verified into {args.output}, {skipped} skipped. {prefilter.summary()}"
+    if candidate_stats:
+        message += f" {candidate_summary(candidate_stats)}"
+    return message
+
+
+def run_job(args, report):
+    if args.job == "learn":
+        from pattern_learner import learn_patterns
+        with report.timed("learn"):
+            return learn_patterns(min_confidence=args.min_confidence, min_support=args.min_support,
+                                  dry_run=args.dry_run, progress=report.progress)
+
+    if args.job == "generate":
+        if args.input:
+            return generate_file(args, report)
+        from email_generator import run_email_generator
+        with report.timed("generate"):
+            return run_email_generator(workers=args.workers, chunk_size=args.chunk_size,
+                                       dry_run=args.dry_run, progress=report.progress, dedup=not args.no_dedup)
+
+    if args.input:
+        return verify_file(args, report)
+    from email_verification import FLUSH_CHUNK_SIZE, run_email_verifier
+    with report.timed("verify"):
+        return run_email_verifier(chunk_size=args.chunk_size or FLUSH_CHUNK_SIZE, concurrency=args.concurrency,
+                                  dry_run=args.dry_run, progress=report.progress,
+                                  multi_candidate=args.multi_candidate)
+
+
+def main(argv=None):
+    from hunter_verifier import VERIFY_CONCURRENCY
+    from pattern_learner import PATTERN_MIN_CONFIDENCE, PATTERN_MIN_SUPPORT
+
+    parser = argparse.ArgumentParser(description="Run the email generator, verifier or pattern learner "
+                                                 "without the Streamlit app")
+    parser.add_argument("--storage", choices=["sheets", "local"],
+                        help="Storage backend for the tabs (default: EMAILGEN_STORAGE or sheets)")
+    parser.add_argument("--db", default=LOCAL_STORAGE_PATH, help="SQLite file for --storage local")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Drop the jobs' own output and warnings instead of sending them to stderr")
+    parser.add_argument("--metrics-json", help="Write the run report (timers, counters, histograms) to this JSON file")
+    parser.add_argument("--metrics-prom", help="Write the run's metrics to this Prometheus text file")
+    jobs = parser.add_subparsers(dest="job", required=True)
+    for name, help_text in [("generate", "Generate emails (Extract tab or --input contacts CSV)"),
+                            ("verify", "Verify emails (Generated tab or --input generated CSV)")]:
+        job = jobs.add_parser(name, help=help_text)
+        job.add_argument("--input", help="Stream this CSV instead of reading the storage tab")
+        job.add_argument("--output", help="CSV that results are appended to (required with --input)")
+        job.add_argument("--chunk-size", type=int, help=f"Rows per chunk (default: {DEFAULT_CHUNK_SIZE} for files)")
+        job.add_argument("--dry-run", action="store_true", help="Report what would be done without writing or spending credits")
+        if name == "generate":
+            job.add_argument("--patterns", help="Email patterns CSV (default: the 'Email Patterns' tab)")
+            job.add_argument("--workers", type=int, help="Matching processes (default: chosen from the batch size)")
+            job.add_argument("--no-dedup", action="store_true",
+                             help="Keep contacts already generated, validated or in History (Extract tab only)")
+        else:
+            job.add_argument("--concurrency", type=int, default=VERIFY_CONCURRENCY, help="Hunter requests in flight")
+            job.add_argument("--multi-candidate", action="store_true",
+                             help="Try every fallback guess of unmatched contacts until one is valid")
+    learn = jobs.add_parser("learn", help="Learn email patterns of new domains from verified History rows")
+    learn.add_argument("--min-confidence", type=float, default=PATTERN_MIN_CONFIDENCE,
+                       help="Share of a domain's valid addresses the pattern must explain")
+    learn.add_argument("--min-support", type=int, default=PATTERN_MIN_SUPPORT,
+                       help="Valid addresses that must fit the pattern")
+    learn.add_argument("--dry-run", action="store_true", help="Report what would be learned without writing")
+    learn.set_defaults(input=None, chunk_size=None)
+    args = parser.parse_args(argv)
+    if args.input:
+        args.chunk_size = args.chunk_size or DEFAULT_CHUNK_SIZE
+        if not args.output and not args.dry_run:
+            parser.error("--output is required with --input")
+
+    if args.storage:
+        use_storage(make_storage(args.storage, args.db))
+
+    metrics = reset_metrics()
+    report = ProgressReport(args.job, sys.stdout)
+    report.emit("start", input=args.input or "storage", dry_run=args.dry_run, chunk_size=args.chunk_size)
+    chatter = sys.stderr
+    if args.quiet:
+        chatter = open(os.devnull, "w")
+        logging.disable(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(chatter):
+            result = run_job(args, report)
+    except Exception as e:
+        report.emit("error", message=str(e), timings=report.timings)
+        return 1
+    finally:
+        metrics.write_reports(args.metrics_json, args.metrics_prom)
+    # The storage jobs report their own failures by printing them and returning None
+    if result is None:
+        report.emit("error", message="job failed, see its output", timings=report.timings)
+        return 1
+    report.emit("done", result=result, timings=report.timings,
+                counters=metrics.counters, cache_hit_ratios=metrics.ratios())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from aiohttp import web
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range
+
+from hunter_stub import make_app
+
+
+# In-memory stand-in for a gspread Worksheet, covering the calls the app makes
+class FakeWorksheet:
+    def __init__(self, title, rows=None):
+        self.title = title
+        self.rows = [list(row) for row in rows or []]
+        self.calls = []
+
+    def _log(self, name, cells=0):
+        self.calls.append((name, cells))
+
+    def row_values(self, row):
+        self._log("row_values")
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def get_all_values(self):
+        self._log("get_all_values", sum(len(row) for row in self.rows))
+        return [list(row) for row in self.rows]
+
+    def get_all_records(self):
+        self._log("get_all_records", sum(len(row) for row in self.rows))
+        if not self.rows:
+            return []
+        headers = self.rows[0]
+        return [dict(zip(headers, row + [""] * (len(headers) - len(row)))) for row in self.rows[1:]]
+
+    def get(self, range_name):
+        grid = a1_range_to_grid_range(range_name)
+        start = grid.get("startRowIndex", 0)
+        end = grid.get("endRowIndex", len(self.rows))
+        first_col = grid.get("startColumnIndex", 0)
+        last_col = grid.get("endColumnIndex")
+        values = [list(row[first_col:last_col]) for row in self.rows[start:end]]
+        # Like the Sheets API, trailing empty rows are not returned
+        while values and not any(values[-1]):
+            values.pop()
+        self._log("get", sum(len(row) for row in values))
+        return values
+
+    def append_row(self, values, **kwargs):
+        self._log("append_row", len(values))
+        self.rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self._log("append_rows", sum(len(row) for row in values))
+        self.rows.extend(list(row) for row in values)
+
+    def clear(self):
+        self._log("clear")
+        self.rows = []
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets):
+        self.worksheets_by_title = {sheet.title: sheet for sheet in worksheets}
+        self.order = [sheet.title for sheet in worksheets]
+
+    # Raises WorksheetNotFound for a missing tab, like gspread
+    def worksheet(self, title):
+        if title not in self.worksheets_by_title:
+            raise WorksheetNotFound(title)
+        return self.worksheets_by_title[title]
+
+    def get_worksheet(self, index):
+        return self.worksheets_by_title[self.order[index]]
+
+    # Drop-in for sheets.get_worksheet
+    def get_worksheet_handle(self, key, spreadsheet_name=None):
+        return self.get_worksheet(key) if isinstance(key, int) else self.worksheet(key)
+
+
+# hunter_stub served from a background thread of this process:
+#   with HunterStubServer(latency=0.05) as stub:
+#       verify_rows(rows, 2, "key", stub.url, ...)
+class HunterStubServer:
+    def __init__(self, **stub_options):
+        self.app = make_app(**stub_options)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.url = None
+
+    async def _start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/v2/email-verifier"
+
+    def __enter__(self):
+        self.thread.start()
+        self.url = asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    @property
+    def requests(self):
+        return self.app["requests"]
@@ -0,0 +1,233 @@
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import email_generator  # noqa: E402
+from email_generator import (  # noqa: E402
+    format_company_name,
+    find_best_match,
+    generate_email_from_pattern,
+    clean_name,
+)
+from pattern_matcher import PatternMatcher  # noqa: E402
+from hunter_verifier import verify_rows  # noqa: E402
+from benchmarks.fakes import FakeWorksheet, FakeSpreadsheet, HunterStubServer  # noqa: E402
+from email_verification import VALIDATION_HEADERS  # noqa: E402
+
+# Offline benchmark of the generator and verifier against the bundled CSVs,
+# with Google Sheets and Hunter replaced by in-process fakes.
+#
+#   python benchmarks/offline.py --contacts 10000
+#   python benchmarks/offline.py --contacts 100000 --save-baseline
+#   python benchmarks/offline.py --compare      # exit 1 on a throughput regression
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "offline_baseline.json")
+PATTERNS_CSV = os.path.join(ROOT, "OLD CONTENT", "email_structures.csv")
+CONTACT_CSVS = [
+    os.path.join(ROOT, "OLD CONTENT", "contacts.csv"),
+    os.path.join(ROOT, "First Test Batch", "matched(original-feed).csv"),
+    os.path.join(ROOT, "First Test Batch", "unmatched(full list).csv"),
+    os.path.join(ROOT, "First Test Batch", "hunterio-all-matched.csv"),
+    os.path.join(ROOT, "First Test Batch", "valid-unmatched.csv"),
+]
+EXTRACT_HEADERS = ["Name", "Current company", "Current position", "About",
+                   "Skills 1", "Skills 2", "Skills 3", "url"]
+
+# Noise added to companies when scaling the corpus up
+COMPANY_SUFFIXES = ["", "", "", " Ltd", " Inc", " Group", " LLP", " Limited", " & Co", " UK"]
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def load_patterns():
+    return [["domain", "Organization", "email_pattern"]] + [
+        [row["domain"], row["Organization"], row["email_pattern"]] for row in read_csv(PATTERNS_CSV)
+    ]
+
+
+def load_people():
+    people = []
+    for path in CONTACT_CSVS:
+        for row in read_csv(path):
+            if row.get("company"):
+                people.append((row.get("first_name", ""), row.get("last_name", ""), row["company"]))
+    return people
+
+
+# Extract rows scaled to `count` contacts, with name and company noise past the originals
+def synthetic_contacts(people, count, seed=1):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(count):
+        first, last, company = people[i % len(people)]
+        if i >= len(people):
+            first, _, _ = rnd.choice(people)
+            company += rnd.choice(COMPANY_SUFFIXES)
+            if rnd.random() < 0.1:
+                position = rnd.randrange(len(company))
+                company = company[:position] + company[position + 1:]
+        rows.append([f"{first} {last}", company, "Analyst", "About text " * 20,
+                     "Skill", "Skill", "Skill", f"https://www.linkedin.com/in/contact-{i}"])
+    return rows
+
+
+def percentiles(samples_ns):
+    ordered = sorted(samples_ns)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] / 1e6
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+# Call `func(*args)` for each args tuple and report throughput and latency percentiles
+def time_calls(func, arg_list):
+    samples = []
+    start = time.perf_counter()
+    for args in arg_list:
+        t0 = time.perf_counter_ns()
+        func(*args)
+        samples.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - start
+    return {"calls": len(arg_list), "seconds": elapsed,
+            "throughput_per_s": len(arg_list) / elapsed if elapsed else 0.0, **percentiles(samples)}
+
+
+def time_once(func, items):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    return result, {"items": items, "seconds": elapsed,
+                    "throughput_per_s": items / elapsed if elapsed else 0.0}
+
+
+# Full run_email_generator against fake sheets, in a scratch directory so the
+# local caches start cold
+def run_generator(pattern_rows, extract_rows):
+    spreadsheet = FakeSpreadsheet([
+        FakeWorksheet("Extract", [EXTRACT_HEADERS] + extract_rows),
+        FakeWorksheet("Generated", [email_generator.GENERATED_HEADERS]),
+        FakeWorksheet("Email Patterns", pattern_rows),
+        FakeWorksheet("Validation", [VALIDATION_HEADERS]),
+        FakeWorksheet("History", [VALIDATION_HEADERS]),
+    ])
+    original = email_generator.get_worksheet
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        email_generator.get_worksheet = spreadsheet.get_worksheet_handle
+        try:
+            email_generator.run_email_generator()
+        finally:
+            email_generator.get_worksheet = original
+            os.chdir(cwd)
+    return spreadsheet.worksheet("Generated").rows[1:]
+
+
+def run_benchmarks(contact_count, verify_count, hunter_latency):
+    pattern_rows = load_patterns()
+    extract_rows = synthetic_contacts(load_people(), contact_count)
+    companies = [row[1] for row in extract_rows]
+    report = {"config": {"contacts": contact_count, "patterns": len(pattern_rows) - 1,
+                         "verify": verify_count, "hunter_latency_s": hunter_latency},
+              "stages": {}}
+    stages = report["stages"]
+
+    stages["format_company_name"] = time_calls(format_company_name, [(c,) for c in companies])
+    stages["clean_name"] = time_calls(clean_name, [(part,) for row in extract_rows for part in row[0].split()[:2]])
+
+    patterns_sheet = FakeWorksheet("Email Patterns", pattern_rows)
+    email_structures, stages["load_patterns"] = time_once(
+        lambda: email_generator.load_email_structures(patterns_sheet), len(pattern_rows) - 1)
+    matcher, stages["build_matcher"] = time_once(lambda: PatternMatcher(email_structures), len(email_structures))
+
+    # Single lookups are slow; a sample is enough for their latency profile
+    sample = companies[:min(len(companies), 2000)]
+    stages["find_best_match"] = time_calls(find_best_match, [(c, matcher) for c in sample])
+    formatted = [format_company_name(c) for c in companies]
+    matches, stages["match_many"] = time_once(lambda: matcher.match_many(formatted, workers=-1), len(formatted))
+
+    email_args = []
+    for row, match in zip(extract_rows, matches):
+        parts = row[0].split()
+        first = clean_name(parts[0]) if parts else ""
+        last = clean_name(parts[1]) if len(parts) > 1 else ""
+        pattern, domain = match or ("{first}.{last}@{domain}", "example.com")
+        email_args.append((first, last, pattern, domain))
+    stages["generate_email_from_pattern"] = time_calls(generate_email_from_pattern, email_args)
+
+    generated, stages["run_email_generator"] = time_once(
+        lambda: run_generator(pattern_rows, extract_rows), len(extract_rows))
+
+    tracemalloc.start()
+    run_generator(pattern_rows, extract_rows)
+    report["run_email_generator_peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+
+    if verify_count:
+        rows = generated[:verify_count]
+        # The verifier prints one line per address; keep them out of the report
+        with HunterStubServer(latency=hunter_latency, max_per_second=0) as stub, \
+                contextlib.redirect_stdout(open(os.devnull, "w")):
+            results, stages["verify_rows"] = time_once(
+                lambda: verify_rows(rows, email_generator.GENERATED_HEADERS.index("email"),
+                                    "benchmark", stub.url, concurrency=16, rate_limits=[(1000, 1.0)]),
+                len(rows))
+            stages["verify_rows"]["hunter_requests"] = stub.requests
+
+    return report
+
+
+def compare(report, baseline, tolerance):
+    failed = False
+    for name, stage in report["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before or not before.get("throughput_per_s"):
+            continue
+        ratio = stage["throughput_per_s"] / before["throughput_per_s"]
+        flag = "REGRESSION" if ratio < 1 - tolerance else "ok"
+        failed |= flag == "REGRESSION"
+        print(f"{flag:>10}  {name:<28} {ratio:6.2f}x baseline throughput")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline generator/verifier benchmark")
+    parser.add_argument("--contacts", type=int, default=10000)
+    parser.add_argument("--verify", type=int, default=500, help="Rows sent to the Hunter stub (0 = skip)")
+    parser.add_argument("--hunter-latency", type=float, default=0.05)
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Per-row "skipped" warnings would swamp the report
+    logging.disable(logging.WARNING)
+    report = run_benchmarks(args.contacts, args.verify, args.hunter_latency)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {BASELINE_PATH}")
+    if args.compare:
+        with open(BASELINE_PATH) as f:
+            sys.exit(1 if compare(report, json.load(f), args.tolerance) else 0)
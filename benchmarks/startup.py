@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Startup-time benchmark for the Streamlit app. Each sample runs in a fresh
+# interpreter and measures:
+#   - import: cold `import app`
+#   - first_paint: one full script run of app.py through Streamlit's AppTest
+# It also lists heavy job modules that got imported before any button was pressed.
+#
+#   python benchmarks/startup.py                  # print timings
+#   python benchmarks/startup.py --save-baseline  # record benchmarks/startup_baseline.json
+#   python benchmarks/startup.py --compare        # exit 1 if slower than baseline + tolerance
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "startup_baseline.json")
+
+# Modules that should only load once a job actually runs
+HEAVY_MODULES = ["gspread", "oauth2client", "fuzzywuzzy", "rapidfuzz", "unidecode",
+                 "requests", "aiohttp", "numpy"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+FIRST_PAINT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=60)
+at.secrets["hunter"] = {"api_key": "benchmark"}
+at.secrets["google_sheets"] = {}
+at.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "exception": bool(at.exception)}))
+"""
+
+
+def sample(snippet):
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(runs):
+    imports = [sample(IMPORT_SNIPPET) for _ in range(runs)]
+    paints = [sample(FIRST_PAINT_SNIPPET) for _ in range(runs)]
+    return {
+        "import_seconds": statistics.median(s["seconds"] for s in imports),
+        "first_paint_seconds": statistics.median(s["seconds"] for s in paints),
+        "heavy_modules_at_import": imports[-1]["heavy"],
+        "first_paint_exception": any(s["exception"] for s in paints),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app import and first-paint latency")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown over the baseline, as a fraction")
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline to {BASELINE_PATH}")
+
+    if args.compare:
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        failed = False
+        for key in ("import_seconds", "first_paint_seconds"):
+            limit = baseline[key] * (1 + args.tolerance)
+            if result[key] > limit:
+                print(f"REGRESSION: {key} {result[key]:.3f}s > {limit:.3f}s")
+                failed = True
+        if result["heavy_modules_at_import"]:
+            print(f"REGRESSION: heavy modules imported at startup: {result['heavy_modules_at_import']}")
+            failed = True
+        sys.exit(1 if failed else 0)
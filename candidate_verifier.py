@@ -0,0 +1,137 @@
+from collections import Counter
+from email_generator import GENERATED_HEADERS, UNMATCHED_STATUS, fallback_candidates
+from hunter_verifier import (
+    DERIVED_STATUSES,
+    HUNTER_RATE_LIMITS,
+    VERIFY_CONCURRENCY,
+    count_lookups,
+    email_domain,
+    verify_rows,
+)
+
+# Opt-in: try every fallback guess of unmatched contacts instead of only the first
+MULTI_CANDIDATE_VERIFY = False
+
+# Statuses that end the search for a contact: found, or the domain answers the
+# same for every address so other guesses cannot do better
+FINAL_STATUSES = {"valid", "accept_all"} | set(DERIVED_STATUSES.values())
+
+FIRST_NAME = GENERATED_HEADERS.index("first_name")
+LAST_NAME = GENERATED_HEADERS.index("last_name")
+EMAIL = GENERATED_HEADERS.index("email")
+COMPANY = GENERATED_HEADERS.index("current_company")
+MATCH_STATUS = GENERATED_HEADERS.index("match_status")
+
+
+# Generated rows whose email is only a fallback guess
+def is_unmatched(row):
+    return len(row) > MATCH_STATUS and row[MATCH_STATUS] == UNMATCHED_STATUS
+
+
+# Ranked (pattern, email) guesses for a Generated row: the row's own email
+# first, then the other fallbacks. Hopeless guesses are dropped.
+def row_candidates(row, prefilter=None):
+    email = row[EMAIL].strip()
+    guesses = fallback_candidates(row[FIRST_NAME], row[LAST_NAME], row[COMPANY])
+    own_pattern = next((pattern for pattern, guess in guesses if guess == email), None)
+    others = [(pattern, guess) for pattern, guess in guesses
+              if guess != email and not (prefilter and prefilter.hopeless(guess))]
+    return [(own_pattern, email)] + others
+
+
+# Next guess to try, jumping to the domain's learned pattern when there is one
+def _next_candidate(candidates, learned):
+    position = next((i for i, (pattern, _) in enumerate(candidates) if pattern == learned), 0)
+    return candidates.pop(position)
+
+
+# Verify unmatched Generated rows by trying their guesses in order and stopping
+# at the first valid address. Guesses go out in rounds. Until a domain has a
+# known pattern only one contact there (the scout) is tried per round; once a
+# pattern validates it is recorded in `store`, and every other contact at the
+# domain, in this run and later ones, goes straight to it. If the scout runs
+# out of guesses the other contacts at its domain are tried in parallel.
+#
+# Returns ([(row, result)], stats). `result` is the verified row for the
+# winning guess, or for the row's own email when no guess was valid; rows
+# Hunter gave no verdict for are left out. `on_result(result)` is called as
+# each contact is settled.
+def verify_candidates(rows, api_key, url, store, prefilter=None, concurrency=VERIFY_CONCURRENCY,
+                      rate_limits=HUNTER_RATE_LIMITS, on_result=None):
+    pending = {index: row_candidates(row, prefilter) for index, row in enumerate(rows)}
+    domains = {index: email_domain(candidates[0][1]) for index, candidates in pending.items()}
+    stats = Counter(contacts=len(rows), naive=sum(len(candidates) for candidates in pending.values()))
+    first_results = {}
+    settled = {}
+    verdicts = {}  # email -> [status, score], so a guess shared by two contacts is paid once
+    exhausted = set()  # domains where a contact ran out of guesses
+
+    def settle(index, result):
+        settled[index] = result
+        del pending[index]
+        if result[-2] == "valid":
+            stats["found"] += 1
+        if on_result:
+            on_result(result)
+
+    def answer(index, pattern, email, verdict):
+        result = rows[index][:EMAIL] + [email] + rows[index][EMAIL + 1:] + verdict
+        first_results.setdefault(index, result)
+        if verdict[0] == "valid" and pattern:
+            store.record_pattern(domains[index], pattern)
+        if verdict[0] in FINAL_STATUSES:
+            if verdict[0] != "valid":
+                # A catch-all or dead domain answers the same for every guess,
+                # so it says nothing about which one is right: keep the first
+                result = first_results[index][:-2] + verdict
+            settle(index, result)
+        elif not pending[index]:
+            exhausted.add(domains[index])
+            settle(index, first_results[index])
+
+    while pending:
+        round_rows = []
+        owners = {}  # email -> (index, pattern)
+        scouting = set()
+        for index in list(pending):
+            domain = domains[index]
+            learned = store.learned_pattern(domain)
+            if learned is None and domain not in exhausted:
+                if domain in scouting:
+                    continue
+                scouting.add(domain)
+            pattern, email = _next_candidate(pending[index], learned)
+            if email in verdicts:
+                answer(index, pattern, email, verdicts[email])
+            elif email in owners:
+                # Same guess as another contact this round: wait for its verdict
+                pending[index].insert(0, (pattern, email))
+            else:
+                owners[email] = (index, pattern)
+                round_rows.append(rows[index][:EMAIL] + [email] + rows[index][EMAIL + 1:])
+        if not round_rows:
+            continue
+
+        results = verify_rows(round_rows, EMAIL, api_key, url, concurrency=concurrency,
+                              rate_limits=rate_limits, domain_cache=store)
+        stats["lookups"] += count_lookups(results)
+        for result in results:
+            email = result[EMAIL]
+            verdicts[email] = result[-2:]
+            index, pattern = owners.pop(email)
+            answer(index, pattern, email, result[-2:])
+
+        # No verdict (API errors): keep the best answer so far, or leave the row
+        # in "Generated" for the next run
+        for index, _ in owners.values():
+            if index in first_results:
+                settle(index, first_results[index])
+            else:
+                del pending[index]
+
+    return [(rows[index], settled[index]) for index in sorted(settled)], stats
+
+
+def summary(stats):
+    return (f"Multi-candidate: {stats['found']} of {stats['contacts']} unmatched contacts found "
+            f"with {stats['lookups']} lookups (every guess would take {stats['naive']}).")
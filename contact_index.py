@@ -0,0 +1,183 @@
+import hashlib
+import re
+import sqlite3
+import time
+from collections import Counter
+from itertools import islice
+from metrics import get_metrics
+from name_normalizer import clean_name, format_company_name
+from storage import iter_pages
+
+# Local file holding a hashed key of every contact generated, validated or in
+# History, kept apart per spreadsheet / local storage file (storage key)
+CONTACT_INDEX_PATH = "contact_index.sqlite3"
+
+# Skip contacts already in the index before generating their emails
+CONTACT_DEDUP = True
+
+# Contacts looked up per query
+DEDUP_CHUNK_ROWS = 500
+
+# Tabs whose rows count as processed contacts; they all share these columns
+SYNC_SHEETS = ("Generated", "Validation", "History")
+ROW_FIELDS = ("first_name", "last_name", "current_company", "url")
+
+# Scheme, www. or country subdomain (uk.linkedin.com) in front of a profile URL
+_URL_PREFIX_RE = re.compile(r'^(?:https?://)?(?:www\.|[a-z]{2}\.(?=linkedin\.com))?')
+
+
+# Profile URL without scheme, www., query string, fragment or trailing slash
+def normalize_url(url):
+    url = _URL_PREFIX_RE.sub('', str(url).strip().lower())
+    return url.split('?', 1)[0].split('#', 1)[0].rstrip('/')
+
+
+def _hash(kind, value):
+    return hashlib.blake2b(f"{kind}:{value}".encode("utf-8"), digest_size=16).digest()
+
+
+# (kind, key) pairs identifying a contact: its profile URL, and its cleaned
+# first name, last name and formatted company. Either one matching an indexed
+# contact makes it a duplicate, so a repeat is caught even when its email
+# guess changed. Single-word names get no name key, too many people share them.
+def contact_keys(first_name, last_name, company, url):
+    keys = []
+    url = normalize_url(url or '')
+    if url:
+        keys.append(("url", _hash("url", url)))
+    first = clean_name(str(first_name or ''))
+    last = clean_name(str(last_name or ''))
+    company = format_company_name(company)
+    if first and last and last != "unknown" and company:
+        keys.append(("name", _hash("name", f"{first}|{last}|{company}")))
+    return keys
+
+
+# Keys of an Extract contact, with the name split as build_output_row does
+def extract_contact_keys(contact):
+    name_parts = str(contact.get('Name', '') or '').split()
+    return contact_keys(name_parts[0] if name_parts else '', name_parts[1] if len(name_parts) > 1 else '',
+                        contact.get('Current company', ''), contact.get('url', ''))
+
+
+def _row_hash(row):
+    return hashlib.blake2b("\x1f".join(row).encode("utf-8"), digest_size=16).hexdigest()
+
+
+# SQLite set of contact keys, kept across runs. Filled from the rows the
+# generator writes and synced from the result tabs, reading only the rows
+# appended since the previous sync (a rewritten tab is read again). `scope`
+# is the storage key (storage.get_storage().key): contacts processed on one
+# spreadsheet or local file are not duplicates on another.
+class ContactIndex:
+    def __init__(self, scope, path=CONTACT_INDEX_PATH):
+        self.scope = scope
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS contacts (
+                   scope TEXT NOT NULL,
+                   key BLOB NOT NULL,
+                   kind TEXT NOT NULL,
+                   source TEXT NOT NULL,
+                   added_at REAL NOT NULL,
+                   PRIMARY KEY (scope, key)
+               )"""
+        )
+        # Last row already read from each tab, and a hash of it to notice a rewritten tab
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS sync_state (
+                   scope TEXT NOT NULL,
+                   sheet TEXT NOT NULL,
+                   last_row INTEGER NOT NULL,
+                   row_hash TEXT,
+                   PRIMARY KEY (scope, sheet)
+               )"""
+        )
+        self.conn.commit()
+        self.seen = set()         # keys of the contacts let through in this run
+        self.skipped = Counter()  # duplicates by what gave them away: url, name or run
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM contacts WHERE scope = ?", (self.scope,)).fetchone()[0]
+
+    def _add(self, keyed, source):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO contacts VALUES (?, ?, ?, ?, ?)",
+            [(self.scope, key, kind, source, now) for keys in keyed for kind, key in keys],
+        )
+        self.conn.commit()
+
+    # Index rows laid out with `headers` (Generated / Validation / History columns)
+    def record_rows(self, rows, headers, source="Generated"):
+        columns = [headers.index(field) for field in ROW_FIELDS]
+        self._add([contact_keys(*(row[column] if column < len(row) else '' for column in columns))
+                   for row in rows], source)
+
+    # Read the rows appended to each {name: sheet} since the last sync; returns how many were read
+    def sync(self, sheets):
+        read = 0
+        for name, sheet in sheets.items():
+            headers = sheet.row_values(1)
+            if not all(field in headers for field in ROW_FIELDS):
+                continue
+            state = self.conn.execute(
+                "SELECT last_row, row_hash FROM sync_state WHERE scope = ? AND sheet = ?", (self.scope, name)
+            ).fetchone()
+            last_row, row_hash = state if state else (1, None)
+            # Start over if the last synced row changed (e.g. "Generated" trimmed by the verifier)
+            if last_row > 1 and _row_hash(sheet.row_values(last_row)) != row_hash:
+                last_row = 1
+
+            for start, page in iter_pages(sheet, len(headers), last_row + 1):
+                self.record_rows(page, headers, name)
+                read += len(page)
+                last_row, row_hash = start + len(page) - 1, _row_hash(page[-1])
+            self.conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                              (self.scope, name, last_row, row_hash))
+            self.conn.commit()
+        return read
+
+    # Indexed keys among `keys`
+    def _known(self, keys):
+        known = set()
+        for start in range(0, len(keys), DEDUP_CHUNK_ROWS):
+            chunk = keys[start:start + DEDUP_CHUNK_ROWS]
+            placeholders = ",".join("?" * len(chunk))
+            known.update(key for key, in self.conn.execute(
+                f"SELECT key FROM contacts WHERE scope = ? AND key IN ({placeholders})", [self.scope] + chunk))
+        return known
+
+    # Generator of the contacts that are neither indexed nor repeated earlier
+    # in this run, looked up DEDUP_CHUNK_ROWS at a time. Contacts with no key
+    # (no URL and no full name) always pass.
+    def filter_new(self, contacts):
+        metrics = get_metrics()
+        contacts = iter(contacts)
+        while True:
+            chunk = list(islice(contacts, DEDUP_CHUNK_ROWS))
+            if not chunk:
+                return
+            keyed = [extract_contact_keys(contact) for contact in chunk]
+            known = self._known([key for keys in keyed for _, key in keys])
+            fresh = []
+            for contact, keys in zip(chunk, keyed):
+                duplicate = next((kind for kind, key in keys if key in known), None)
+                if duplicate is None and any(key in self.seen for _, key in keys):
+                    duplicate = "run"
+                if duplicate:
+                    self.skipped[duplicate] += 1
+                    metrics.increment(f"contacts_duplicate_{duplicate}")
+                else:
+                    self.seen.update(key for _, key in keys)
+                    fresh.append(contact)
+            metrics.increment("contacts_checked", len(chunk))
+            yield from fresh
+
+    def summary(self):
+        return (f"{sum(self.skipped.values())} duplicate contacts skipped "
+                f"({self.skipped['url']} by URL, {self.skipped['name']} by name and company, "
+                f"{self.skipped['run']} repeated in this run).")
@@ -1,45 +1,71 @@
-import re
-import unidecode
-from fuzzywuzzy import fuzz, process
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import streamlit as st  # Import Streamlit for secrets
 import logging
-
-# Setup logging to capture issues
-logging.basicConfig(level=logging.INFO)
-
-# Function to clean and format company names into domains
-def format_company_name(company_name):
-    if not isinstance(company_name, str):
-        return ''
-    common_words = ['inc', 'llc', 'corp', 'corporation', 'company', 'limited', 'ltd']
-    clean_name = re.sub(r'[^a-zA-Z\s]', '', unidecode.unidecode(company_name)).lower()
-    words = clean_name.split()
-    words = [word for word in words if word not in common_words]
-    domain_name = ''.join(words)
-    return domain_name
-
-# Function to remove accents and special characters from names
-def clean_name(name):
-    clean_name = re.sub(r'[^a-zA-Z]', '', unidecode.unidecode(name))
-    return clean_name.lower()
-
-# Function to run the email generator logic
-def run_email_generator():
-    # Google Sheets setup - now using Streamlit secrets instead of local file
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds_dict = st.secrets["google_sheets"]  # Pull creds from Streamlit secrets
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    client = gspread.authorize(creds)
-
-    # Open the spreadsheet by name
-    spreadsheet = client.open("Contact Creation")
-    extract_sheet = spreadsheet.get_worksheet(0)  # "Extract" tab
-    generated_sheet = spreadsheet.get_worksheet(1)  # "Generated" tab
-    email_patterns_sheet = spreadsheet.worksheet("Email Patterns")  # "Email Patterns" tab
-
-    # Load email structures from the "Email Patterns" tab
+import os
+import time
+from itertools import islice
+from gspread.exceptions import WorksheetNotFound
+from storage import extract_filler_rows, get_storage, get_worksheet, iter_pages, used_row_count
+from pattern_matcher import PatternMatcher
+from pattern_index import load_pattern_index
+from match_cache import MatchCache
+from contact_index import CONTACT_DEDUP, SYNC_SHEETS, ContactIndex
+from email_templates import compile_pattern
+from name_normalizer import format_company_name, clean_name, clean_hyphenated_name
+from metrics import get_metrics
+
+# Setup logging to capture issues; EMAILGEN_LOG_LEVEL=DEBUG adds a line per address
+logging.basicConfig(level=os.environ.get("EMAILGEN_LOG_LEVEL", "INFO").upper())
+
+# Cores used to score companies against the Email Patterns tab (-1 = all)
+MATCH_WORKERS = -1
+
+# Processes matching companies in run_email_generator (None = chosen from the
+# batch size, 1 = match in this process)
+GENERATION_WORKERS = None
+
+# Below this many contacts a process pool costs more than it saves: starting
+# spawned workers takes most of a second, about what matching 50,000 contacts
+# takes in this process with cdist on every core
+PARALLEL_MIN_CONTACTS = 500000
+
+# Contacts per generation process when the count is chosen automatically
+CONTACTS_PER_WORKER = 100000
+
+# Extract rows read per request, matched per batch and appended to "Generated"
+# per call in run_email_generator, so memory stays flat however long the tab is
+GENERATION_CHUNK_ROWS = 2000
+
+# Columns written to the "Generated" tab, in order
+GENERATED_HEADERS = ['first_name', 'last_name', 'email', 'current_company', 'current_position',
+                     'about', 'skills_1', 'skills_2', 'skills_3', 'url', 'match_status']
+
+# match_status of rows generated without an Email Patterns match
+UNMATCHED_STATUS = "Unmatched :("
+
+# Guesses for a contact whose company has no Email Patterns match, most likely first
+FALLBACK_PATTERNS = [
+    "{first}.{last}@{domain}",
+    "{first}_{last}@{domain}",
+    "{first}@{domain}",
+    "{first}{last}@{domain}",
+    "{f}.{last}@{domain}",
+]
+
+# Ranked (pattern, email) guesses at the company name + '.com' domain.
+# Names are used as cleaned, without the "unknown" substitution of
+# generate_email_from_pattern.
+def fallback_candidates(first_name, last_name, company):
+    cleaned_first_name = clean_name(first_name)
+    cleaned_last_name = clean_name(last_name)
+    values = {
+        'first': cleaned_first_name,
+        'last': cleaned_last_name,
+        'first_initial': cleaned_first_name[:1],
+        'domain': format_company_name(company) + '.com',
+    }
+    return [(pattern, compile_pattern(pattern).render(values)) for pattern in FALLBACK_PATTERNS]
+
+# Function to load email structures from the "Email Patterns" tab
+def load_email_structures(email_patterns_sheet):
     email_structures = {}
     email_patterns = email_patterns_sheet.get_all_records()
 
@@ -49,131 +75,330 @@ def run_email_generator():
             email_pattern = row['email_pattern']
             organization = row['Organization']
             if organization and isinstance(organization, str):  # Ensure organization is not None and is a string
+                # Reject patterns with unknown or malformed placeholders up front
+                try:
+                    compile_pattern(email_pattern)
+                except ValueError as e:
+                    logging.warning(f"Email pattern for '{organization}' skipped: {e}")
+                    continue
                 organization = format_company_name(organization)
                 email_structures[organization] = (email_pattern, domain_name)
-
-    # Get all contacts from the "Extract" sheet
+    return email_structures
+
+# Extract column -> ContactRecord slot, for the columns the generator reads
+CONTACT_FIELDS = {
+    'Name': 'name',
+    'Current company': 'company',
+    'Current position': 'position',
+    'About': 'about',
+    'Skills 1': 'skills_1',
+    'Skills 2': 'skills_2',
+    'Skills 3': 'skills_3',
+    'url': 'url',
+}
+
+# One Extract contact held in slots instead of a per-row dict. get() reads it
+# by column header, so it can stand in for a get_all_records record.
+class ContactRecord:
+    __slots__ = tuple(CONTACT_FIELDS.values())
+
+    def __init__(self, values):
+        for slot, value in zip(self.__slots__, values):
+            setattr(self, slot, value)
+
+    def get(self, header, default=None):
+        slot = CONTACT_FIELDS.get(header)
+        value = getattr(self, slot) if slot else None
+        return default if value is None else value
+
+# Generator of ContactRecords from the "Extract" tab, read `page_rows` rows at
+# a time. Values are numericised like get_all_records does, and the filler
+# row of the Google Sheet is skipped as in load_contacts.
+def iter_contacts(extract_sheet, page_rows=GENERATION_CHUNK_ROWS):
+    from gspread.utils import numericise
+
+    headers = extract_sheet.row_values(1)
+    if not headers:
+        return
+    # Column of each slot, None for a column the tab does not have
+    positions = [headers.index(header) if header in headers else None for header in CONTACT_FIELDS]
+    metrics = get_metrics()
+    pages = iter_pages(extract_sheet, len(headers), 2 + extract_filler_rows(extract_sheet), page_rows)
+    while True:
+        with metrics.timed("sheet_read"):
+            page = next(pages, None)
+        if page is None:
+            return
+        for row in page[1]:
+            values = []
+            for position in positions:
+                if position is None:
+                    values.append(None)
+                else:
+                    values.append(numericise(row[position]) if position < len(row) else "")
+            yield ContactRecord(values)
+
+# Contacts a streamed Extract tab holds (for progress and sizing the process
+# pool), from the rows in use rather than the size of the grid
+def estimate_contact_count(extract_sheet):
+    count = used_row_count(extract_sheet)
+    return max(count - 1 - extract_filler_rows(extract_sheet), 0) if count else None
+
+# Function to load contacts from the "Extract" tab
+def load_contacts(extract_sheet):
     contacts = extract_sheet.get_all_records()
 
-    # Now we assume that the first row is always the header
-    if contacts:
-        headers = contacts[0]  # This is the header row
-        contacts = contacts[1:]  # Process everything from row 2 onward
-
-    # Split names and generate emails
-    output_emails = []
+    # The Google Sheet repeats the header in its first record; local tabs do not
+    return contacts[extract_filler_rows(extract_sheet):]
 
-    for idx, contact in enumerate(contacts):
-        try:
-            full_name = contact.get('Name', '').strip()
-            company = contact.get('Current company', '').strip()
-
-            if not full_name or not company:  # Handle empty name or company gracefully
-                logging.warning(f"Row {idx + 2} skipped: Missing name or company. Name: {full_name}, Company: {company}")
-                continue
-
-            # Ensure the name is processed even if partially missing
-            name_parts = full_name.split()
-            original_first_name = name_parts[0] if len(name_parts) > 0 else "unknown"
-            original_last_name = name_parts[1] if len(name_parts) > 1 else "unknown"
-
-            cleaned_first_name = clean_name(original_first_name)
-            cleaned_last_name = clean_name(original_last_name)
-            first_initial = cleaned_first_name[0] if cleaned_first_name else ""
-
-            # Find the best match for the company
-            result = find_best_match(company, email_structures)
-
-            if result:
-                pattern, domain = result
-                email = generate_email_from_pattern(cleaned_first_name, cleaned_last_name, pattern, domain)
-                match_status = "Match!"
-            else:
-                # Fallback email generation if unmatched
-                formatted_domain = format_company_name(company) + '.com'
-                patterns = [
-                    f"{cleaned_first_name}.{cleaned_last_name}@{formatted_domain}",
-                    f"{cleaned_first_name}_{cleaned_last_name}@{formatted_domain}",
-                    f"{cleaned_first_name}@{formatted_domain}",
-                    f"{cleaned_first_name}{cleaned_last_name}@{formatted_domain}",
-                    f"{first_initial}.{cleaned_last_name}@{formatted_domain}"
-                ]
-                email = patterns[0]  # Pick the first pattern as fallback
-                match_status = "Unmatched :("
-
-            # Append contact email data to output list
-            output_emails.append({
-                'first_name': original_first_name,
-                'last_name': original_last_name,
-                'email': email,
-                'current_company': company,
-                'current_position': contact.get('Current position', ''),
-                'about': contact.get('About', ''),
-                'skills_1': contact.get('Skills 1', ''),
-                'skills_2': contact.get('Skills 2', ''),
-                'skills_3': contact.get('Skills 3', ''),
-                'url': contact.get('url', ''),
-                'match_status': match_status
-            })
-
-        except Exception as e:
-            # Log any errors and continue with the next contact
-            logging.error(f"Error processing row {idx + 2}: {e}")
-            continue
-
-    # Prepare data for Google Sheets bulk append
-    output_data = [[row['first_name'], row['last_name'], row['email'], row['current_company'], row['current_position'], row['about'], row['skills_1'], row['skills_2'], row['skills_3'], row['url'], row['match_status']] for row in output_emails]
-
-    # Write all generated emails to Google Sheets at once
-    if output_data:
-        generated_sheet.append_rows(output_data, table_range='A2')
-
-    # Clear the Extract sheet, except the header row
+# Function to clear the Extract sheet, except the header row
+def clear_extract_sheet(extract_sheet):
     extract_headers = extract_sheet.row_values(1)
     extract_sheet.clear()
     extract_sheet.append_row(extract_headers)
 
-    return f"{len(output_emails)} emails generated successfully!"  # Return a message for Streamlit to display
+# Function to turn one Extract contact into a "Generated" row, or None if it is skipped
+def build_output_row(idx, contact, result):
+    full_name = contact.get('Name', '').strip()
+    company = contact.get('Current company', '').strip()
+
+    if not full_name or not company:  # Handle empty name or company gracefully
+        logging.warning(f"Row {idx + 2} skipped: Missing name or company. Name: {full_name}, Company: {company}")
+        return None
+
+    # Ensure the name is processed even if partially missing
+    name_parts = full_name.split()
+    original_first_name = name_parts[0] if len(name_parts) > 0 else "unknown"
+    original_last_name = name_parts[1] if len(name_parts) > 1 else "unknown"
+
+    cleaned_first_name = clean_name(original_first_name)
+    cleaned_last_name = clean_name(original_last_name)
+
+    if result:
+        pattern, domain = result
+        extra = extra_name_fields(pattern, name_parts)
+        email = generate_email_from_pattern(cleaned_first_name, extra.pop('last_name', cleaned_last_name),
+                                            pattern, domain, **extra)
+        match_status = "Match!"
+    else:
+        # Fallback email generation if unmatched; the other guesses are only
+        # tried by the verifier's multi-candidate mode
+        email = fallback_candidates(original_first_name, original_last_name, company)[0][1]
+        match_status = UNMATCHED_STATUS
+
+    # Contact email data in GENERATED_HEADERS order
+    return [original_first_name, original_last_name, email, company,
+            contact.get('Current position', ''), contact.get('About', ''),
+            contact.get('Skills 1', ''), contact.get('Skills 2', ''), contact.get('Skills 3', ''),
+            contact.get('url', ''), match_status]
+
+# Generator yielding a "Generated" row per usable contact. Companies are matched
+# `chunk_size` contacts at a time through the match cache (a list: all at once
+# by default; any other iterable is consumed GENERATION_CHUNK_ROWS at a time).
+# `first_index` offsets the row numbers in log lines; `progress(done, total)` is
+# called after each chunk, with `total` the list length or the given estimate.
+def generate_output_rows(contacts, matcher, match_cache, chunk_size=None, first_index=0, progress=None,
+                         total=None):
+    metrics = get_metrics()
+    if isinstance(contacts, list):
+        total = len(contacts)
+        chunk_size = chunk_size or max(total, 1)
+    chunk_size = chunk_size or GENERATION_CHUNK_ROWS
+    contacts = iter(contacts)
+    start = 0
+    while True:
+        chunk = list(islice(contacts, chunk_size))
+        if not chunk:
+            break
+        # Score the chunk's companies against the Email Patterns tab in one batch
+        hits, misses = match_cache.hits, match_cache.misses
+        with metrics.timed("match"):
+            matches = match_cache.match_many(
+                matcher,
+                [format_company_name(contact.get('Current company')) for contact in chunk],
+                workers=MATCH_WORKERS,
+            )
+        metrics.increment("match_cache_hits", match_cache.hits - hits)
+        metrics.increment("match_cache_misses", match_cache.misses - misses)
+        # Rows are yielded as they are built, so the time spent in the consumer
+        # is left out of the "generate" stage
+        generate_seconds = 0.0
+        generated = 0
+        for offset, (contact, result) in enumerate(zip(chunk, matches)):
+            idx = first_index + start + offset
+            started = time.perf_counter()
+            try:
+                row = build_output_row(idx, contact, result)
+            except Exception as e:
+                # Log any errors and continue with the next contact
+                logging.error(f"Error processing row {idx + 2}: {e}")
+                continue
+            finally:
+                generate_seconds += time.perf_counter() - started
+            if row is not None:
+                generated += 1
+                yield row
+        metrics.add_time("generate", generate_seconds)
+        metrics.increment("rows_generated", generated)
+        start += len(chunk)
+        if progress:
+            progress(start, total)
+
+# Number of matching processes for a batch: an explicit `workers` wins,
+# otherwise one per CONTACTS_PER_WORKER contacts, up to the core count
+def choose_generation_workers(contact_count, workers=None):
+    if workers:
+        return max(1, workers)
+    if contact_count < PARALLEL_MIN_CONTACTS:
+        return 1
+    return max(1, min(os.cpu_count() or 1, contact_count // CONTACTS_PER_WORKER))
+
+
+# {name: sheet} of the result tabs the contact index syncs; tabs the
+# spreadsheet does not have yet hold no contacts and are left out
+def result_sheets():
+    sheets = {}
+    for name in SYNC_SHEETS:
+        try:
+            sheets[name] = get_worksheet(name)
+        except WorksheetNotFound:
+            logging.info(f"No '{name}' tab, not checked for duplicate contacts")
+    return sheets
+
+
+# Function to run the email generator logic. Contacts stream from the Extract
+# tab and rows go to "Generated" `chunk_size` at a time, so only one chunk of
+# contacts and rows is in memory. Extract is cleared once every row is written.
+# With dedup, contacts already generated, validated or in History (see
+# contact_index) are dropped before matching. With dry_run the rows are
+# generated but neither tab is touched.
+def run_email_generator(workers=GENERATION_WORKERS, chunk_size=None, dry_run=False, progress=None,
+                        dedup=CONTACT_DEDUP):
+    # Worksheet handles are cached for the whole process
+    extract_sheet = get_worksheet(0)  # "Extract" tab
+    generated_sheet = get_worksheet(1)  # "Generated" tab
+    email_patterns_sheet = get_worksheet("Email Patterns")  # "Email Patterns" tab
+    metrics = get_metrics()
+
+    # The indexed table comes from the local snapshot unless the tab changed
+    with metrics.timed("pattern_load"):
+        pattern_index = load_pattern_index(email_patterns_sheet)
+
+    # Contacts are read from the "Extract" sheet page by page as generation goes
+    chunk_size = chunk_size or GENERATION_CHUNK_ROWS
+    contacts = iter_contacts(extract_sheet, chunk_size)
+    contact_estimate = estimate_contact_count(extract_sheet)
+    contacts_read = 0
+
+    # Repeats of earlier contacts are dropped in one pass over the stream,
+    # against an index kept up to date with the result tabs
+    contact_index = ContactIndex(get_storage().key)
+    if dedup:
+        with metrics.timed("sheet_read"):
+            contact_index.sync(result_sheets())
+        contacts = contact_index.filter_new(contacts)
+
+    # Skipped duplicates count as done
+    def track(done, total=None, **counts):
+        nonlocal contacts_read
+        contacts_read = done + sum(contact_index.skipped.values())
+        if progress:
+            progress(contacts_read, total, **counts)
+
+    # Build the pattern index once for the whole run; large batches spread the
+    # matching over a process pool with one index per worker. Rows are still
+    # built here, in order, so output and log lines match the sequential run.
+    workers = choose_generation_workers(contact_estimate or 0, workers)
+    with metrics.timed("pattern_load"):
+        matcher = pattern_index.matcher(workers)
+
+    # Split names and generate emails, reusing match results cached by
+    # earlier runs against the same patterns
+    match_cache = MatchCache(pattern_index.fingerprint)
+    generated = 0
+    try:
+        output_rows = generate_output_rows(contacts, matcher, match_cache, chunk_size, progress=track,
+                                           total=contact_estimate)
+        while True:
+            output_data = list(islice(output_rows, chunk_size))
+            if not output_data:
+                break
+            generated += len(output_data)
+            if not dry_run:
+                with metrics.timed("write"):
+                    generated_sheet.append_rows(output_data, table_range='A2')
+                contact_index.record_rows(output_data, GENERATED_HEADERS)
+    finally:
+        match_cache.close()
+        contact_index.close()
+        if workers > 1:
+            matcher.close()
+    logging.info(f"Match cache: {match_cache.hits} hits, {match_cache.misses} misses")
+    duplicates = f" {contact_index.summary()}" if dedup else ""
+
+    if dry_run:
+        return f"Dry run: {generated} emails would be generated from {contacts_read} contacts.{duplicates}"
+
+    with metrics.timed("write"):
+        clear_extract_sheet(extract_sheet)
+
+    # Return a message for Streamlit to display
+    return (f"{generated} emails generated successfully! "
+            f"Match cache hit rate: {match_cache.hit_rate():.0%} "
+            f"({match_cache.hits} of {match_cache.hits + match_cache.misses} companies){duplicates}")
+
+# Optional name fields for the richer placeholders, only worked out when the
+# pattern actually uses them. A pattern with a middle initial reads a name of
+# three or more words as first, middles, last: the middle comes from
+# name_parts[1:-1] and 'last_name' (the last word) replaces the second word.
+def extra_name_fields(pattern, name_parts):
+    fields = compile_pattern(pattern).fields
+    extra = {}
+    last_index = 1
+    if 'middle_initial' in fields:
+        middle_names = name_parts[1:-1]
+        extra['middle_name'] = clean_name(middle_names[0]) if middle_names else ""
+        if middle_names:
+            last_index = len(name_parts) - 1
+            extra['last_name'] = clean_name(name_parts[last_index])
+    if 'first_hyphen' in fields:
+        extra['first_hyphen'] = clean_hyphenated_name(name_parts[0]) if name_parts else ""
+    if 'last_hyphen' in fields:
+        extra['last_hyphen'] = clean_hyphenated_name(name_parts[last_index]) if len(name_parts) > last_index else ""
+    return extra
 
 # Helper functions (put these at the top if they are referenced elsewhere)
-def generate_email_from_pattern(first_name, last_name, pattern, domain):
+# The pattern is compiled once (see email_templates) and rendered in a single pass
+def generate_email_from_pattern(first_name, last_name, pattern, domain,
+                                middle_name="", first_hyphen=None, last_hyphen=None):
     if not first_name:  
         first_name = "unknown"
     if not last_name:  
         last_name = "unknown"
-    first_initial = first_name[0] if first_name else ""
-    last_initial = last_name[0] if last_name else ""
-    email = (pattern
-             .replace('{first}', first_name)
-             .replace('{last}', last_name)
-             .replace('{f}', first_initial)
-             .replace('{firstinitial}', first_initial)
-             .replace('{firstname}', first_name)
-             .replace('{lastname}', last_name)
-             .replace('{lastinitial}', last_initial)
-             .replace('{domain}', domain))
-    return email
+    values = {
+        'first': first_name,
+        'last': last_name,
+        'first_initial': first_name[0],
+        'last_initial': last_name[0],
+        'middle_initial': middle_name[:1],
+        'first_hyphen': first_hyphen or first_name,
+        'last_hyphen': last_hyphen or last_name,
+        'domain': domain,
+    }
+    return compile_pattern(pattern).render(values)
 
 def find_best_match(company_name, email_structures):
     formatted_name = format_company_name(company_name)
-    
-    # Filter out email structures with 'Unmatched' as the pattern
-    valid_email_structures = {org: val for org, val in email_structures.items() if val[0] != 'Unmatched'}
-    
-    # Find the best matches using fuzzy matching
-    matches = process.extract(formatted_name, valid_email_structures.keys(), scorer=fuzz.token_sort_ratio)
-    
-    # Check for valid matches above a certain threshold
-    if matches:
-        # Sort the matches by their similarity score in descending order
-        matches = sorted(matches, key=lambda x: x[1], reverse=True)
-        
-        # Return the first valid match (score > 80) or None if no valid match is found
-        for match in matches:
-            if match[1] > 80:
-                return email_structures.get(match[0])
-    
-    return None
+
+    # Accept a prebuilt PatternMatcher; a plain dict is indexed on the spot
+    # ('Unmatched' patterns are filtered out while indexing)
+    if isinstance(email_structures, PatternMatcher):
+        matcher = email_structures
+    else:
+        matcher = PatternMatcher(email_structures)
+
+    # Return the best valid match (score > 80) or None if no valid match is found
+    return matcher.match(formatted_name)
 
 
 
@@ -0,0 +1,77 @@
+import re
+from functools import lru_cache
+
+# Placeholders allowed in the Email Patterns tab and the name field each one reads
+PLACEHOLDERS = {
+    'first': 'first',
+    'firstname': 'first',
+    'last': 'last',
+    'lastname': 'last',
+    'f': 'first_initial',
+    'firstinitial': 'first_initial',
+    'l': 'last_initial',
+    'lastinitial': 'last_initial',
+    'm': 'middle_initial',
+    'middleinitial': 'middle_initial',
+    'firsthyphen': 'first_hyphen',  # first name with hyphens kept (jean-philippe)
+    'lasthyphen': 'last_hyphen',    # last name with hyphens kept (smith-jones)
+    'domain': 'domain',
+}
+
+# {name} or {name:N}, where N truncates the value to N characters (e.g. {last:4})
+PLACEHOLDER_RE = re.compile(r'\{([a-z]+)(?::([1-9][0-9]*))?\}')
+
+# The optional middle initial with the separator before it, or failing that
+# the one after it, so "{first}.{m}.{last}" collapses to "{first}.{last}"
+MIDDLE_BEFORE_RE = re.compile(r'[._-]\{(?:m|middleinitial)(?::[1-9][0-9]*)?\}')
+MIDDLE_AFTER_RE = re.compile(r'\{(?:m|middleinitial)(?::[1-9][0-9]*)?\}[._-]?')
+
+
+# A pattern parsed once into a str.format template, so rendering is a single
+# format_map call instead of one str.replace per placeholder. A pattern with a
+# middle initial renders without it, and its separator, for names that have none.
+class EmailTemplate:
+    __slots__ = ('pattern', 'format_string', 'fields', 'without_middle')
+
+    def __init__(self, pattern, format_string, fields, without_middle=None):
+        self.pattern = pattern
+        self.format_string = format_string
+        self.fields = fields
+        self.without_middle = without_middle
+
+    def render(self, values):
+        if self.without_middle is not None and not values.get('middle_initial'):
+            return self.without_middle.render(values)
+        return self.format_string.format_map(values)
+
+
+# Parse and validate a pattern; raises ValueError on unknown placeholders or stray braces.
+# Cached per distinct pattern.
+@lru_cache(maxsize=None)
+def compile_pattern(pattern):
+    if not isinstance(pattern, str):
+        raise ValueError(f"pattern must be text, got {pattern!r}")
+
+    pieces = []
+    fields = set()
+    position = 0
+    for token in PLACEHOLDER_RE.finditer(pattern):
+        pieces.append(_literal(pattern, pattern[position:token.start()]))
+        name, width = token.groups()
+        if name not in PLACEHOLDERS:
+            raise ValueError(f"unknown placeholder {{{name}}} in pattern {pattern!r}")
+        field = PLACEHOLDERS[name]
+        fields.add(field)
+        pieces.append('{' + field + (':.' + width if width else '') + '}')
+        position = token.end()
+    pieces.append(_literal(pattern, pattern[position:]))
+    without_middle = None
+    if 'middle_initial' in fields:
+        without_middle = compile_pattern(MIDDLE_AFTER_RE.sub('', MIDDLE_BEFORE_RE.sub('', pattern)))
+    return EmailTemplate(pattern, ''.join(pieces), frozenset(fields), without_middle)
+
+
+def _literal(pattern, text):
+    if '{' in text or '}' in text:
+        raise ValueError(f"malformed placeholder in pattern {pattern!r}")
+    return text
@@ -1,77 +1,107 @@
-import streamlit as st
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
-import requests
-import io
-from contextlib import redirect_stdout, redirect_stderr
-
-# Access the Hunter.io API key
-HUNTER_API_KEY = st.secrets["hunter"]["api_key"]
-
-# Access Google Service Account credentials
-SERVICE_ACCOUNT_INFO = st.secrets["google_sheets"]
+import logging
+from hunter_verifier import VERIFY_CONCURRENCY, count_lookups, verify_rows
+from verification_store import VerificationStore
+from prefilter import PreFilter
+from candidate_verifier import MULTI_CANDIDATE_VERIFY, is_unmatched, summary as candidate_summary, verify_candidates
+from sheets import SPREADSHEET_NAME
+from storage import get_worksheet
+from metrics import get_metrics
+from key_pool import get_key_pool
 
 # Configuration
-SPREADSHEET_NAME = "Contact Creation"
 HUNTER_URL = "https://api.hunter.io/v2/email-verifier"
 
+# Verified rows appended to the sheets at a time
+FLUSH_CHUNK_SIZE = 25
+
+# Header row of the "Validation" and "History" tabs
+VALIDATION_HEADERS = [
+    "first_name",
+    "last_name",
+    "email",
+    "current_company",
+    "current_position",
+    "about",
+    "skills_1",
+    "skills_2",
+    "skills_3",
+    "url",
+    "match_status",
+    "status",
+    "score",
+]
+
+
+# Access the Hunter.io API keys (read when a run starts, not at import).
+# HUNTER_API_KEYS / HUNTER_API_KEY take precedence over the secrets, for runs
+# outside the app such as cron jobs; see key_pool.load_api_keys.
+def get_hunter_keys():
+    return get_key_pool()
+
+
+# The key pool with each key's quota read from the account endpoint, so
+# rotation skips keys that are already out of verifications. Called once per
+# run; the app's usage header refreshes the pool too, cron runs only here.
+# A key whose refresh fails keeps its last known values.
+def refresh_hunter_keys():
+    pool = get_hunter_keys()
+    with get_metrics().timed("key_refresh"):
+        usage = pool.refresh()
+    if usage['keys_failed']:
+        print(f"Could not read the usage of Hunter API keys {', '.join(usage['keys_failed'])}")
+    return pool
 
-# Authenticate with Google Sheets API
-def get_gspread_client():
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(
-        dict(SERVICE_ACCOUNT_INFO), scope
-    )
-    client = gspread.authorize(creds)
-    return client
 
+# Write the header row to any results sheet that is still empty
+def ensure_headers(*sheets):
+    for sheet in sheets:
+        if not sheet.row_values(1):
+            sheet.append_row(VALIDATION_HEADERS)
 
-def run_email_verifier():
+
+# Append journaled results to each sheet; returns the emails that were written
+def flush_results(store, sheets):
+    flushed = set()
+    for name, sheet in sheets.items():
+        pending = store.pending(name)
+        if pending:
+            with get_metrics().timed("write"):
+                sheet.append_rows([row for _, row in pending], value_input_option="RAW")
+            store.mark_flushed(name, [email for email, _ in pending])
+            print(f"Updated '{name}' sheet with {len(pending)} rows.")
+            flushed.update(email for email, _ in pending)
+    return flushed
+
+
+# Verify the "Generated" tab, writing results out `chunk_size` at a time. With
+# dry_run nothing is written and no lookups are made; the run stops once it
+# knows how many addresses it would verify. `progress(done, total,
+# verified=..., credits=...)` is called at each checkpoint. With
+# multi_candidate, unmatched contacts are verified through their other
+# fallback guesses too (see candidate_verifier).
+def run_email_verifier(chunk_size=FLUSH_CHUNK_SIZE, concurrency=VERIFY_CONCURRENCY, dry_run=False, progress=None,
+                       multi_candidate=MULTI_CANDIDATE_VERIFY):
+    metrics = get_metrics()
+    store = None
     try:
         print("Starting email verification...")
-        client = get_gspread_client()
-        print("Authenticated with Google Sheets.")
 
-        # Open the spreadsheet by name
-        spreadsheet = client.open(SPREADSHEET_NAME)
+        # Access the sheets by name; client and handles are cached for the process
+        generated_sheet = get_worksheet("Generated")
+        validation_sheet = get_worksheet("Validation")
+        history_sheet = get_worksheet("History")
         print(f"Opened spreadsheet: {SPREADSHEET_NAME}")
 
-        # Access the sheets by name
-        generated_sheet = spreadsheet.worksheet("Generated")
-        validation_sheet = spreadsheet.worksheet("Validation")
-        history_sheet = spreadsheet.worksheet("History")
-
         # Ensure header rows in the "Validation" and "History" tabs
-        validation_headers = [
-            "first_name",
-            "last_name",
-            "email",
-            "current_company",
-            "current_position",
-            "about",
-            "skills_1",
-            "skills_2",
-            "skills_3",
-            "url",
-            "match_status",
-            "status",
-            "score",
-        ]
-        if not validation_sheet.row_values(1):
-            validation_sheet.append_row(validation_headers)
-
-        if not history_sheet.row_values(1):
-            history_sheet.append_row(validation_headers)
+        if not dry_run:
+            ensure_headers(validation_sheet, history_sheet)
 
         # Read data from "Generated" tab
-        data = generated_sheet.get_all_values()
+        with metrics.timed("sheet_read"):
+            data = generated_sheet.get_all_values()
         if not data or len(data) == 1:
             print("No data found in 'Generated' sheet.")
-            return
+            return "No data found in 'Generated' sheet."
 
         headers = data[0]
         rows = data[1:]  # Exclude the header row
@@ -81,103 +111,148 @@ def run_email_verifier():
             email_col_index = headers.index("email")
         except ValueError:
             print("'email' column not found in 'Generated' sheet.")
-            return
-
-        # Read emails from "History" tab to avoid re-verifying
-        history_data = history_sheet.get_all_values()[1:]  # Skip header
-        history_email_index = validation_headers.index("email")
-        history_emails = [
-            row[history_email_index].strip()
-            for row in history_data
-            if len(row) > history_email_index
-        ]
-        history_emails_set = set(history_emails)
+            return "'email' column not found in 'Generated' sheet."
+
+        # Mirror only the History rows appended since the last run into the local store
+        store = VerificationStore()
+        with metrics.timed("sheet_read"):
+            new_history_rows = store.sync_history(history_sheet, VALIDATION_HEADERS)
+        print(f"Synced {new_history_rows} new rows from 'History'.")
 
-        # Collect rows to verify, skipping emails already in history
+        # Append anything a previous, interrupted run verified but never wrote out
+        sheets = {"Validation": validation_sheet, "History": history_sheet}
+        done_emails = set() if dry_run else flush_results(store, sheets)
+
+        # Collect rows to verify, skipping emails verified within the TTL
         rows_to_verify = []
+        store_hits = 0
         for row in rows:
             if len(row) > email_col_index:
                 email = row[email_col_index].strip()
-                if email and email not in history_emails_set:
+                if email and not store.is_fresh(email):
                     rows_to_verify.append(row)
                 else:
                     if not email:
                         print(f"Empty email in row: {row}")
                     else:
-                        print(f"Email {email} already in history. Skipping.")
+                        logging.debug("Email %s already in history. Skipping.", email)
+                        store_hits += 1
+                        done_emails.add(email)
             else:
                 print(f"No email found in row: {row}")
+        metrics.increment("verification_store_hits", store_hits)
+        metrics.increment("verification_store_misses", len(rows_to_verify))
+        if store_hits:
+            print(f"{store_hits} emails already in history. Skipping.")
+
+        # Local checks first: malformed, placeholder, blocked and repeated
+        # addresses never reach Hunter
+        prefilter = PreFilter()
+        rows_to_verify, rejected_rows = prefilter.filter_rows(rows_to_verify, email_col_index)
+        print(prefilter.summary())
 
-        if not rows_to_verify:
+        unmatched_rows = []
+        if multi_candidate:
+            unmatched_rows = [row for row in rows_to_verify if is_unmatched(row)]
+            rows_to_verify = [row for row in rows_to_verify if not is_unmatched(row)]
+
+        if rows_to_verify or unmatched_rows:
+            print(f"Total new emails to verify: {len(rows_to_verify) + len(unmatched_rows)}")
+        else:
             print("No new emails to verify.")
-            return
-
-        print(f"Total new emails to verify: {len(rows_to_verify)}")
-
-        # Verify emails using Hunter.io
-        verification_results = []
-        for row in rows_to_verify:
-            email = row[email_col_index].strip()
-            print(f"Verifying email: {email}")
-            params = {"email": email, "api_key": HUNTER_API_KEY}
-            response = requests.get(HUNTER_URL, params=params)
-            print(f"HTTP Status Code: {response.status_code}")
-            print(f"Response Text: {response.text}")
-
-            try:
-                result = response.json()
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse JSON for email {email}: {e}")
-                continue
-
-            if "data" in result:
-                status = result["data"].get("status", "unknown")
-                score = result["data"].get("score", "unknown")
-                print(f"Email: {email}, Status: {status}, Score: {score}")
-                # Append the full row data along with status and score
-                verification_results.append(row + [status, score])
-                history_emails_set.add(email)
-            elif "errors" in result:
-                print(f"Error verifying email {email}: {result['errors']}")
-            else:
-                print(f"Unexpected response for email {email}: {result}")
 
-        print(f"{len(verification_results)} emails verified successfully!")
+        if dry_run:
+            return (f"Dry run: {len(rows_to_verify) + len(unmatched_rows)} of {len(rows)} emails would be verified. "
+                    f"{prefilter.summary()}")
 
-        # Update "Validation" tab
-        if verification_results:
-            validation_sheet.append_rows(verification_results, value_input_option="RAW")
-            print("Updated 'Validation' sheet.")
+        # Rejected rows are written out with their local status, so they leave
+        # "Generated" like verified ones
+        for row in rejected_rows:
+            store.journal_result(row[email_col_index].strip(), row)
+        if rejected_rows:
+            done_emails |= flush_results(store, sheets)
 
-        # Update "History" tab
-        if verification_results:
-            history_sheet.append_rows(verification_results, value_input_option="RAW")
-            print("Updated 'History' sheet.")
+        # One Hunter run per phase, so connections, concurrency and the per-key
+        # rate limits carry across the whole batch. Every verdict is journaled
+        # locally as it arrives, and each `chunk_size` of them are appended to
+        # the sheets (a checkpoint) from the result callback, while the other
+        # requests wait on the event loop.
+        keys = refresh_hunter_keys() if rows_to_verify or unmatched_rows else None
+        total = len(rows_to_verify) + len(unmatched_rows)
+        verified_count = credits_used = processed = unflushed = 0
+        candidate_stats = None
 
-        # Remove verified contacts from "Generated" tab, keeping only the header row
-        if verification_results:
-            generated_sheet.clear()
-            generated_sheet.append_row(headers)
-            print("Cleared 'Generated' sheet and restored header row.")
+        def checkpoint(**counts):
+            nonlocal unflushed
+            done_emails.update(flush_results(store, sheets))
+            unflushed = 0
+            print(f"Checkpoint: {processed}/{total} emails processed.")
+            if progress:
+                progress(processed, total, verified=verified_count, credits=credits_used,
+                         saved=prefilter.saved, **counts)
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
+        def journal(row, lookups=0):
+            nonlocal verified_count, credits_used, processed, unflushed
+            store.journal_result(row[email_col_index].strip(), row)
+            verified_count += 1
+            credits_used += lookups
+            processed += 1
+            unflushed += 1
+            if unflushed >= chunk_size:
+                checkpoint()
+
+        if rows_to_verify:
+            with metrics.timed("verify"):
+                verify_rows(
+                    rows_to_verify, email_col_index, keys, HUNTER_URL, concurrency=concurrency,
+                    on_result=lambda row: journal(row, count_lookups([row])),
+                    domain_cache=store,
+                )
+            # Rows Hunter gave no verdict for count as processed too
+            processed = len(rows_to_verify)
+            checkpoint()
+
+        # Unmatched contacts: their guesses are tried in turn until one is valid.
+        # The row written out carries the winning address, so the contact's
+        # original guess is what marks it done in "Generated". Lookups are
+        # counted once the search is over.
+        if unmatched_rows:
+            with metrics.timed("verify"):
+                resolved, candidate_stats = verify_candidates(
+                    unmatched_rows, keys, HUNTER_URL, store, prefilter=prefilter,
+                    concurrency=concurrency, on_result=journal,
+                )
+            credits_used += candidate_stats["lookups"]
+            processed = total
+            checkpoint(found=candidate_stats["found"])
+            done_emails.update(row[email_col_index].strip() for row, _ in resolved)
+        if candidate_stats:
+            print(candidate_summary(candidate_stats))
 
+        metrics.increment("emails_verified", verified_count)
+        metrics.increment("hunter_credits", credits_used)
+        metrics.increment("prefilter_saved", prefilter.saved)
+        print(f"{verified_count} emails verified successfully!")
 
-# --- Button with stdout/stderr capture to display prints in the UI ---
-if st.button("Run Email Verifier"):
-    buf_out, buf_err = io.StringIO(), io.StringIO()
-    with redirect_stdout(buf_out), redirect_stderr(buf_err):
-        run_email_verifier()
+        # Remove finished contacts from "Generated" tab, keeping the header row and
+        # any rows that still need verifying
+        remaining = [
+            row for row in rows
+            if not (len(row) > email_col_index and row[email_col_index].strip() in done_emails)
+        ]
+        if len(remaining) < len(rows):
+            with metrics.timed("write"):
+                generated_sheet.clear()
+                generated_sheet.append_rows([headers] + remaining, value_input_option="RAW")
+            print(f"Trimmed 'Generated' sheet, {len(remaining)} rows left to verify.")
 
-    out = buf_out.getvalue().strip()
-    err = buf_err.getvalue().strip()
+        message = f"{verified_count} emails verified successfully! {prefilter.summary()}"
+        if candidate_stats:
+            message += f" {candidate_summary(candidate_stats)}"
+        return message
 
-    if out:
-        st.subheader("Logs")
-        st.code(out)
-    if err:
-        st.subheader("Errors")
-        st.code(err)
-    if not out and not err:
-        st.info("No output captured.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    finally:
+        if store is not None:
+            store.close()
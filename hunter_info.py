@@ -1,29 +1,98 @@
 import streamlit as st
-import requests
 import json
+import os
+import threading
+import time
+
+# File holding the last known usage stats, so a fresh process has values to show
+ACCOUNT_INFO_PATH = 'account_info.json'
+
+# Seconds between background refreshes of the usage stats
+USAGE_REFRESH_SECONDS = 300
 
 # Function to get account information from Hunter.io
-def get_hunter_account_info():
+def get_hunter_account_info(api_key=None):
+    import requests  # Only needed once the refresh thread runs
+
     # Retrieve the API key within the function, not globally
-    API_KEY = st.secrets["hunter"]["api_key"]
+    API_KEY = api_key or st.secrets["hunter"]["api_key"]
     
     url = "https://api.hunter.io/v2/account"
     params = {'api_key': API_KEY}
-    response = requests.get(url, params=params)
+    response = requests.get(url, params=params, timeout=30)
     
     if response.status_code == 200:
         return response.json()['data']
     else:
         raise Exception(f"Failed to retrieve data from Hunter.io API: {response.status_code}")
 
-# Function to save the account info to a JSON file
-def save_account_info():
-    account_info = get_hunter_account_info()
-    with open('account_info.json', 'w') as f:
-        json.dump({
-            'used_searches': account_info['requests']['searches']['used'],
-            'used_verifications': account_info['requests']['verifications']['used']
-        }, f)
+# Function to pull the usage counters out of the account info
+def usage_values(account_info):
+    return {
+        'used_searches': account_info['requests']['searches']['used'],
+        'used_verifications': account_info['requests']['verifications']['used']
+    }
+
+# Function to save the combined usage of a key pool to a JSON file, with each
+# key's counters to seed the pool of a later process. A refresh where any key
+# failed raises and leaves the last saved values in place.
+def save_account_info(pool):
+    values = pool.refresh()
+    if values['keys_failed']:
+        raise Exception(f"no usage for keys {', '.join(values['keys_failed'])}")
+    values['key_usage'] = pool.key_usage()
+    with open(ACCOUNT_INFO_PATH, 'w') as f:
+        json.dump(values, f)
+    return values
+
+# Usage stats of every key in a KeyPool, served from memory and refreshed by a
+# background thread, so the page never waits on the Hunter account endpoint.
+# Refreshing also updates the pool's per-key quota used by the verifier.
+class UsageCache:
+    def __init__(self, pool, refresh_seconds=USAGE_REFRESH_SECONDS):
+        self.pool = pool
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.values = {}
+        self.updated_at = None
+        self.error = None
+
+        # Start from the last values saved to disk, in the header and the pool
+        try:
+            with open(ACCOUNT_INFO_PATH, 'r') as f:
+                self.values = json.load(f)
+            self.updated_at = os.path.getmtime(ACCOUNT_INFO_PATH)
+        except (OSError, ValueError):
+            pass
+        pool.seed(self.values.get('key_usage', {}))
+
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            self.wake.wait(self.refresh_seconds)
+            self.wake.clear()
 
+    # Fetch new values now (blocking); failures keep the last known values
+    def refresh(self):
+        try:
+            values = save_account_info(self.pool)
+        except Exception as e:
+            with self.lock:
+                self.error = str(e)
+            return
+        with self.lock:
+            self.values = values
+            self.updated_at = time.time()
+            self.error = None
 
+    # Ask the background thread to refresh without waiting for it
+    def request_refresh(self):
+        self.wake.set()
 
+    # (values, updated_at, error) as last seen
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values), self.updated_at, self.error
@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+from collections import deque
+from aiohttp import web
+
+# Local stand-in for Hunter's /v2/email-verifier endpoint, for trying the
+# verifier without spending credits:
+#   python hunter_stub.py --port 8765 --latency 0.2 --error-rate 0.05
+# then point the verifier at http://localhost:8765/v2/email-verifier
+# Domains starting with "catchall" are accept-all and ones starting with
+# "dead" have no MX records; everything else gets a hash-based verdict.
+
+# Hash-based verdicts of ordinary domains; accept_all only comes from the
+# catch-all domains above
+STATUSES = ["valid", "invalid", "unknown"]
+
+
+# Deterministic fake verdict so repeated runs see the same answers
+def fake_verdict(email):
+    local, _, domain = email.partition("@")
+    if "@" not in email or not local or "." not in domain:
+        return "invalid", 0
+    if domain.startswith("catchall"):
+        return "accept_all", 70
+    if domain.startswith("dead"):
+        return "invalid", 0
+    digest = int(hashlib.md5(email.encode("utf-8")).hexdigest(), 16)
+    status = STATUSES[digest % len(STATUSES)]
+    score = {"valid": 90 + digest % 11, "invalid": 0, "unknown": 40}[status]
+    return status, score
+
+
+def error_response(status, error_id, details):
+    return web.json_response({"errors": [{"id": error_id, "code": status, "details": details}]},
+                             status=status)
+
+
+def make_app(latency=0.0, error_rate=0.0, max_per_second=10, api_key=None):
+    recent = deque()
+    app = web.Application()
+    app["requests"] = 0
+
+    async def email_verifier(request):
+        app["requests"] += 1
+        key = request.query.get("api_key")
+        email = request.query.get("email", "")
+        if not key or (api_key and key != api_key):
+            return error_response(401, "authentication_failed", "No user found for the API key supplied")
+        if not email:
+            return error_response(400, "wrong_params", "You are missing the email parameter")
+
+        # Same per-second limit as Hunter
+        now = time.monotonic()
+        while recent and now - recent[0] > 1.0:
+            recent.popleft()
+        if max_per_second and len(recent) >= max_per_second:
+            return error_response(429, "too_many_requests", "You have reached the rate limit")
+        recent.append(now)
+
+        if latency:
+            await asyncio.sleep(random.uniform(latency / 2, latency * 1.5))
+        if random.random() < error_rate:
+            return error_response(503, "service_unavailable", "Temporary failure")
+
+        status, score = fake_verdict(email)
+        domain = email.partition("@")[2]
+        # Only malformed addresses and dead domains have no mail server at all
+        has_mx = "." in domain and not domain.startswith("dead")
+        return web.json_response({
+            "data": {
+                "status": status,
+                "result": "deliverable" if status == "valid" else "risky",
+                "score": score,
+                "email": email,
+                "regexp": "." in domain,
+                "gibberish": False,
+                "disposable": False,
+                "webmail": domain in ("gmail.com", "yahoo.com", "outlook.com", "hotmail.com"),
+                "mx_records": has_mx,
+                "smtp_server": has_mx,
+                "smtp_check": status == "valid",
+                "accept_all": status == "accept_all",
+                "block": False,
+                "sources": [],
+            },
+            "meta": {"params": {"email": email}},
+        })
+
+    app.router.add_get("/v2/email-verifier", email_verifier)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Hunter.io email-verifier stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--max-per-second", type=int, default=10, help="429 above this rate (0 = off)")
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.error_rate, args.max_per_second), port=args.port)
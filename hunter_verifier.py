@@ -0,0 +1,271 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+import aiohttp
+from key_pool import as_key_pool, is_quota_error
+from metrics import get_metrics
+
+# Hunter's Email Verifier limits: 10 requests per second and 300 per minute
+HUNTER_RATE_LIMITS = [(10, 1.0), (300, 60.0)]
+
+# Requests in flight at once per API key (also sizes the connection pool)
+VERIFY_CONCURRENCY = 8
+
+# Per-request timeout in seconds; Hunter can take a while on slow SMTP servers
+REQUEST_TIMEOUT = 60
+
+# Retry policy for rate limiting, server errors and unfinished verifications
+# (202 = still in progress, 222 = remote SMTP server failure, both "retry later")
+RETRY_STATUSES = {202, 222, 429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+# Domain verdicts that make verifying more addresses at the domain pointless,
+# and the status written for addresses skipped because of them
+DERIVED_STATUSES = {
+    "accept_all": "accept_all (domain)",
+    "invalid_domain": "invalid (domain)",
+}
+
+
+# Verified rows in `results` that cost a Hunter credit (derived statuses are free)
+def count_lookups(results):
+    derived = set(DERIVED_STATUSES.values())
+    return sum(1 for row in results if row[-2] not in derived)
+
+
+# Token bucket allowing `rate` requests per `per` seconds. Bursts default to a
+# single token so requests are spread evenly instead of tripping Hunter's
+# sliding-window counters at the start of each second.
+class TokenBucket:
+    def __init__(self, rate, per, burst=1):
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+
+# One bucket per (rate, per) limit; a request must get a token from each
+class RateLimiter:
+    def __init__(self, limits):
+        self.buckets = [TokenBucket(rate, per) for rate, per in limits]
+
+    async def acquire(self):
+        for bucket in self.buckets:
+            await bucket.acquire()
+
+
+# Hands out the keys of a KeyPool for one verify_rows run, each behind its
+# own rate limiter, so N keys give N times one account's throughput
+class KeyRotation:
+    def __init__(self, pool, rate_limits):
+        self.pool = pool
+        self.limiters = {key.api_key: RateLimiter(rate_limits) for key in pool.keys}
+
+    # A key whose limiter has let the request through, or None once every key is exhausted
+    async def acquire(self):
+        while True:
+            key = self.pool.choose()
+            if key is not None:
+                try:
+                    await self.limiters[key.api_key].acquire()
+                except BaseException:
+                    # Cancelled while waiting for the limiter: hand the unused key back
+                    self.pool.release(key)
+                    raise
+                return key
+            wait = self.pool.wait_time()
+            if wait is None:
+                return None
+            await asyncio.sleep(wait)
+
+
+# Exponential backoff with jitter, honouring Retry-After when Hunter sends it
+def backoff_delay(attempt, retry_after=None):
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# Verify a single address, returning Hunter's parsed JSON or None on failure.
+# Each attempt's latency goes into the hunter_request_seconds histogram. A key
+# that is rate limited cools down and one out of verifications is dropped;
+# either way the retry goes out straight away on another key if there is one.
+async def verify_email(session, semaphore, keys, url, email):
+    metrics = get_metrics()
+    for attempt in range(MAX_RETRIES + 1):
+        retry_after = None
+        async with semaphore:
+            key = await keys.acquire()
+            if key is None:
+                print(f"Not verifying {email}: every Hunter API key is out of verifications")
+                return None
+            params = {"email": email, "api_key": key.api_key}
+            started = time.perf_counter()
+            # No status until this attempt gets a response, so a cancelled or
+            # failed request never counts as a paid verification
+            status = None
+            try:
+                async with session.get(url, params=params) as response:
+                    status = response.status
+                    text = await response.text()
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, text = None, str(e)
+            finally:
+                keys.pool.release(key, paid=status == 200)
+            metrics.observe("hunter_request_seconds", time.perf_counter() - started)
+            metrics.increment("hunter_requests")
+            if status == 429:
+                metrics.increment("hunter_rate_limited")
+            elif status is None:
+                metrics.increment("hunter_network_errors")
+
+        if status in (403, 429) and is_quota_error(text):
+            if keys.pool.mark_exhausted(key):
+                metrics.increment("hunter_keys_exhausted")
+                print(f"Hunter API key {key.label} is out of verifications")
+        elif status is not None and status not in RETRY_STATUSES:
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError as e:
+                print(f"Failed to parse JSON for email {email}: {e}")
+                return None
+
+        if attempt < MAX_RETRIES:
+            delay = backoff_delay(attempt, retry_after)
+            metrics.increment("hunter_retries")
+            logging.debug("Retrying %s in %.1fs (HTTP %s)", email, delay, status or text)
+            if status == 429:
+                # Fail over: the next attempt picks a key that is not cooling down
+                keys.pool.mark_rate_limited(key, delay)
+            elif status != 403:
+                await asyncio.sleep(delay)
+
+    metrics.increment("hunter_failures")
+    print(f"Giving up on email {email} after {MAX_RETRIES} retries")
+    return None
+
+
+# Turn Hunter's response into `row + [status, score]`, or None if it has no verdict
+def parse_result(row, email, result):
+    if result is None:
+        return None
+    if "data" in result:
+        status = result["data"].get("status", "unknown")
+        score = result["data"].get("score", "unknown")
+        logging.debug("Email: %s, Status: %s, Score: %s", email, status, score)
+        # Append the full row data along with status and score
+        return row + [status, score]
+    if "errors" in result:
+        print(f"Error verifying email {email}: {result['errors']}")
+    else:
+        print(f"Unexpected response for email {email}: {result}")
+    return None
+
+
+def email_domain(email):
+    return email.rpartition("@")[2].lower()
+
+
+# What a single Hunter verdict says about the whole domain, if anything
+def domain_verdict(data):
+    if data.get("accept_all") or data.get("status") == "accept_all":
+        return "accept_all"
+    if data.get("mx_records") is False:
+        return "invalid_domain"
+    if data.get("webmail"):
+        return "webmail"
+    return None
+
+
+async def verify_rows_async(rows, email_col_index, api_key, url,
+                            concurrency=VERIFY_CONCURRENCY, rate_limits=HUNTER_RATE_LIMITS,
+                            on_result=None, domain_cache=None):
+    keys = KeyRotation(as_key_pool(api_key), rate_limits)
+    concurrency *= len(keys.pool)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    results = [None] * len(rows)
+    skipped = 0
+
+    def finish(index, verified):
+        results[index] = verified
+        if verified is not None and on_result is not None:
+            on_result(verified)
+
+    async def verify_row(session, index):
+        row = rows[index]
+        email = row[email_col_index].strip()
+        result = await verify_email(session, semaphore, keys, url, email)
+        if domain_cache is not None and result and "data" in result:
+            verdict = domain_verdict(result["data"])
+            if verdict:
+                domain_cache.record_domain_verdict(email_domain(email), verdict)
+        finish(index, parse_result(row, email, result))
+
+    # Probe one address per domain first; the rest are only sent to Hunter
+    # if the domain is not already known to be catch-all or dead
+    async def verify_domain(session, domain, indexes):
+        nonlocal skipped
+        if domain_cache is not None:
+            if domain_cache.domain_verdict(domain) not in DERIVED_STATUSES:
+                await verify_row(session, indexes[0])
+                indexes = indexes[1:]
+            verdict = domain_cache.domain_verdict(domain)
+            if verdict in DERIVED_STATUSES:
+                for index in indexes:
+                    row = rows[index]
+                    logging.debug("Email: %s, Status: %s", row[email_col_index].strip(), DERIVED_STATUSES[verdict])
+                    finish(index, row + [DERIVED_STATUSES[verdict], ""])
+                skipped += len(indexes)
+                return
+        await asyncio.gather(*(verify_row(session, index) for index in indexes))
+
+    domains = defaultdict(list)
+    for index, row in enumerate(rows):
+        domains[email_domain(row[email_col_index].strip())].append(index)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await asyncio.gather(*(verify_domain(session, domain, indexes)
+                               for domain, indexes in domains.items()))
+    if skipped:
+        get_metrics().increment("hunter_lookups_skipped", skipped)
+        print(f"Skipped {skipped} lookups on catch-all or dead domains.")
+    return results
+
+
+# Drop-in replacement for the sequential Hunter loop: verifies `rows`
+# concurrently and returns `row + [status, score]` for each verified row,
+# in the original order. `on_result` is called with each of those rows as
+# soon as its verdict arrives. With a `domain_cache` (see VerificationStore),
+# addresses at known catch-all or dead domains get a derived status instead
+# of a paid lookup. `api_key` is a single key, a list of keys or a KeyPool;
+# requests are spread over the keys with failover between them.
+def verify_rows(rows, email_col_index, api_key, url,
+                concurrency=VERIFY_CONCURRENCY, rate_limits=HUNTER_RATE_LIMITS,
+                on_result=None, domain_cache=None):
+    results = asyncio.run(verify_rows_async(rows, email_col_index, api_key, url,
+                                            concurrency, rate_limits, on_result, domain_cache))
+    return [row for row in results if row is not None]
@@ -0,0 +1,144 @@
+import io
+import sys
+import threading
+import time
+
+# Finished jobs remembered per spreadsheet, newest last
+JOB_HISTORY_SIZE = 5
+
+
+# Stand-in for sys.stdout / sys.stderr that sends writes from job threads to
+# the job's own buffer and everything else to the original stream.
+# contextlib.redirect_stdout would swap the stream for every thread at once.
+class _ThreadRoutedStream:
+    def __init__(self, original):
+        self.original = original
+        self.buffers = {}  # thread ident -> io.StringIO
+
+    def _target(self):
+        return self.buffers.get(threading.get_ident(), self.original)
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+
+_install_lock = threading.Lock()
+
+
+def _routed(name):
+    with _install_lock:
+        stream = getattr(sys, name)
+        if not isinstance(stream, _ThreadRoutedStream):
+            stream = _ThreadRoutedStream(stream)
+            setattr(sys, name, stream)
+        return stream
+
+
+# One background run of a job function. Progress fields are updated by the
+# job's progress(done, total, **counts) callback and read by the UI.
+class Job:
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+        self.state = "running"  # running / done / failed
+        self.started_at = time.time()
+        self.finished_at = None
+        self.done = 0
+        self.total = None
+        self.counts = {}
+        self.result = None
+        self.error = None
+        self.output = io.StringIO()
+        self.errors = io.StringIO()
+
+    def progress(self, done, total=None, **counts):
+        self.done = done
+        self.total = total
+        self.counts.update(counts)
+
+    @property
+    def running(self):
+        return self.state == "running"
+
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.done / elapsed if elapsed else 0.0
+
+    # Seconds left at the current rate, or None if unknown
+    def eta(self):
+        rate = self.rate()
+        if not self.total or not rate:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+
+# Runs jobs on background threads, at most one at a time per spreadsheet
+# (single flight), and keeps finished jobs so page reruns can show their
+# results instead of starting the work again. Meant to be shared by every
+# session of the app (st.cache_resource).
+class JobManager:
+    def __init__(self, history_size=JOB_HISTORY_SIZE):
+        self.history_size = history_size
+        self.lock = threading.Lock()
+        self.jobs = {}  # spreadsheet key -> [Job, ...], newest last
+
+    # Start `func(progress=...)` for `key` unless a job is already running there.
+    # Returns (job, started): the new job, or the running one and False.
+    # `on_finish(job)` runs on the job thread once the job has ended.
+    def submit(self, name, key, func, on_finish=None):
+        with self.lock:
+            current = self.latest(key)
+            if current is not None and current.running:
+                return current, False
+            job = Job(name, key)
+            history = self.jobs.setdefault(key, [])
+            history.append(job)
+            del history[:-self.history_size]
+
+        thread = threading.Thread(target=self._run, args=(job, func, on_finish), daemon=True,
+                                  name=f"job-{name}")
+        thread.start()
+        return job, True
+
+    def _run(self, job, func, on_finish):
+        stdout, stderr = _routed("stdout"), _routed("stderr")
+        ident = threading.get_ident()
+        stdout.buffers[ident] = job.output
+        stderr.buffers[ident] = job.errors
+        try:
+            job.result = func(progress=job.progress)
+            job.state = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            job.finished_at = time.time()
+            del stdout.buffers[ident]
+            del stderr.buffers[ident]
+        if on_finish:
+            on_finish(job)
+
+    def latest(self, key):
+        history = self.jobs.get(key)
+        return history[-1] if history else None
+
+    def running(self, key):
+        job = self.latest(key)
+        return job if job is not None and job.running else None
+
+    # Forget finished jobs for `key` (the running one, if any, is kept)
+    def clear_finished(self, key):
+        with self.lock:
+            self.jobs[key] = [job for job in self.jobs.get(key, []) if job.running]
@@ -0,0 +1,210 @@
+import hashlib
+import os
+import threading
+import time
+
+# How often a request waiting for a key re-checks the pool when every usable
+# key only has requests in flight
+RELEASE_POLL_SECONDS = 0.05
+
+# Phrases in Hunter's 429/403 error details that mean the key's monthly
+# verifications are used up, as opposed to a per-second rate limit
+QUOTA_ERROR_PHRASES = ("usage limit", "quota", "upgrade your plan")
+
+# Per-key counters read from the account endpoint, saved to seed a later process
+USAGE_FIELDS = ('used_searches', 'used_verifications', 'available_verifications')
+
+
+# Hunter API keys from HUNTER_API_KEYS (comma-separated) or HUNTER_API_KEY,
+# else st.secrets["hunter"]["api_keys"] (a list) or st.secrets["hunter"]["api_key"]
+def load_api_keys():
+    keys = os.environ.get("HUNTER_API_KEYS") or os.environ.get("HUNTER_API_KEY")
+    if keys:
+        return [key.strip() for key in keys.split(",") if key.strip()]
+    import streamlit as st
+
+    hunter = st.secrets["hunter"]
+    if "api_keys" in hunter:
+        return list(hunter["api_keys"])
+    return [hunter["api_key"]]
+
+
+# What the pool knows about one key. Quota figures stay None until the
+# account endpoint has been read for the key.
+class HunterKey:
+    __slots__ = ('api_key', 'used_searches', 'used_verifications', 'available_verifications',
+                 'in_flight', 'cooldown_until', 'exhausted', 'error')
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self.used_searches = None
+        self.used_verifications = None
+        self.available_verifications = None
+        self.in_flight = 0  # requests handed out and not yet released
+        self.cooldown_until = 0.0
+        self.exhausted = False
+        self.error = None
+
+    @property
+    def label(self):
+        return f"…{self.api_key[-4:]}"
+
+    # Identifies the key in saved usage without writing the key itself to disk
+    @property
+    def digest(self):
+        return hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def remaining(self):
+        if self.available_verifications is None or self.used_verifications is None:
+            return None
+        return max(self.available_verifications - self.used_verifications, 0)
+
+
+# Several Hunter accounts used as one. Requests are handed out round-robin
+# over the keys that still have verifications left and are not cooling down
+# after a 429; quota is tracked locally per lookup and corrected from the
+# account endpoint on refresh. Thread-safe, so one pool can be shared by the
+# app's usage header and every job in the process.
+class KeyPool:
+    def __init__(self, api_keys):
+        if not api_keys:
+            raise ValueError("No Hunter API keys configured")
+        # Each key once, in the configured order
+        self.keys = [HunterKey(api_key) for api_key in dict.fromkeys(api_keys)]
+        self.lock = threading.Lock()
+        self.next_index = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Requests in flight count against the known quota, so concurrent
+    # requests never overdraw a key
+    def _usable(self, key, now):
+        if key.exhausted or key.cooldown_until > now:
+            return False
+        return key.remaining is None or key.in_flight < key.remaining
+
+    # Next key to send a request with, or None if no key can take one right now.
+    # Every key handed out must be given back with release().
+    def choose(self):
+        with self.lock:
+            now = time.monotonic()
+            for offset in range(len(self.keys)):
+                key = self.keys[(self.next_index + offset) % len(self.keys)]
+                if self._usable(key, now):
+                    self.next_index = (self.next_index + offset + 1) % len(self.keys)
+                    key.in_flight += 1
+                    return key
+            return None
+
+    # Seconds until some key may be usable again (cooldown over or a request
+    # released), or None if every key is exhausted
+    def wait_time(self):
+        with self.lock:
+            now = time.monotonic()
+            waits = [max(key.cooldown_until - now, 0.0) for key in self.keys if not key.exhausted]
+            if not waits:
+                return None
+            return max(min(waits), RELEASE_POLL_SECONDS)
+
+    # The request sent with `key` is over; `paid` if it was a billed verification
+    def release(self, key, paid=False):
+        with self.lock:
+            key.in_flight -= 1
+            if paid and key.used_verifications is not None:
+                key.used_verifications += 1
+                if key.remaining == 0:
+                    key.exhausted = True
+
+    def mark_rate_limited(self, key, seconds):
+        with self.lock:
+            key.cooldown_until = max(key.cooldown_until, time.monotonic() + seconds)
+
+    # Returns True the first time, so callers report an exhausted key once
+    def mark_exhausted(self, key):
+        with self.lock:
+            newly = not key.exhausted
+            key.exhausted = True
+            return newly
+
+    # Take the usage counters of one key's account info (hunter_info.get_hunter_account_info)
+    def update_account(self, key, account_info):
+        verifications = account_info['requests']['verifications']
+        with self.lock:
+            key.used_searches = account_info['requests']['searches']['used']
+            key.used_verifications = verifications['used']
+            key.available_verifications = verifications['available']
+            key.exhausted = key.remaining == 0
+            key.error = None
+
+    # Per-key counters by key digest, as saved by hunter_info.save_account_info
+    def key_usage(self):
+        with self.lock:
+            return {key.digest: {field: getattr(key, field) for field in USAGE_FIELDS} for key in self.keys}
+
+    # Give keys that have not been read from the account endpoint yet their
+    # saved counters (key_usage of an earlier process), so a key whose first
+    # refresh fails still has its last known values
+    def seed(self, key_usage):
+        with self.lock:
+            for key in self.keys:
+                saved = key_usage.get(key.digest)
+                if saved and key.used_verifications is None:
+                    for field in USAGE_FIELDS:
+                        setattr(key, field, saved.get(field))
+
+    # Re-read every key's usage from the account endpoint; a key that fails
+    # keeps its last known values. Returns the combined usage.
+    def refresh(self, fetch=None):
+        if fetch is None:
+            from hunter_info import get_hunter_account_info as fetch
+        for key in self.keys:
+            try:
+                self.update_account(key, fetch(key.api_key))
+            except Exception as e:
+                with self.lock:
+                    key.error = str(e)
+        return self.usage()
+
+    # Totals over every key, in the shape of hunter_info.usage_values plus pool details
+    def usage(self):
+        with self.lock:
+            def total(field):
+                values = [getattr(key, field) for key in self.keys]
+                return sum(values) if all(value is not None for value in values) else None
+
+            return {
+                'used_searches': total('used_searches'),
+                'used_verifications': total('used_verifications'),
+                'remaining_verifications': total('remaining'),
+                'keys': len(self.keys),
+                'keys_exhausted': sum(1 for key in self.keys if key.exhausted),
+                'keys_failed': [key.label for key in self.keys if key.error],
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Pool of the configured keys, shared by the whole process
+def get_key_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = KeyPool(load_api_keys())
+        return _pool
+
+
+# Pool for `api_key`: a KeyPool as it is, a single key or a list of keys wrapped in a new one
+def as_key_pool(api_key):
+    if isinstance(api_key, KeyPool):
+        return api_key
+    return KeyPool([api_key] if isinstance(api_key, str) else list(api_key))
+
+
+# Whether a Hunter error response says the key is out of verifications
+def is_quota_error(text):
+    text = text.lower()
+    return any(phrase in text for phrase in QUOTA_ERROR_PHRASES)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+# Local file holding company -> (pattern, domain) results between runs
+MATCH_CACHE_PATH = "match_cache.sqlite3"
+
+# Entries kept before the least recently used ones are evicted
+MATCH_CACHE_MAX_ENTRIES = 50000
+
+
+# Fingerprint of the Email Patterns table; any edit to the sheet changes it.
+# Order is included because it decides ties between equally good matches.
+def pattern_fingerprint(email_structures):
+    payload = json.dumps(list(email_structures.items()), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# SQLite cache of find_best_match results keyed by format_company_name output.
+# Negative results (no match above 80) are cached too.
+class MatchCache:
+    def __init__(self, fingerprint, path=MATCH_CACHE_PATH, max_entries=MATCH_CACHE_MAX_ENTRIES):
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS matches (
+                   fingerprint TEXT NOT NULL,
+                   company TEXT NOT NULL,
+                   matched INTEGER NOT NULL,
+                   pattern TEXT,
+                   domain TEXT,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (fingerprint, company)
+               )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS matches_last_used ON matches (last_used)")
+        # Results computed against an older Email Patterns table are stale
+        self.conn.execute("DELETE FROM matches WHERE fingerprint != ?", (fingerprint,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    # Cached results for the given names as {name: (pattern, domain) or None}
+    def get_many(self, formatted_names):
+        found = {}
+        names = list(set(formatted_names))
+        now = time.time()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT company, matched, pattern, domain FROM matches "
+                f"WHERE fingerprint = ? AND company IN ({placeholders})",
+                [self.fingerprint] + chunk,
+            ).fetchall()
+            for company, matched, pattern, domain in rows:
+                found[company] = (pattern, domain) if matched else None
+            self.conn.executemany(
+                "UPDATE matches SET last_used = ? WHERE fingerprint = ? AND company = ?",
+                [(now, self.fingerprint, company) for company, _, _, _ in rows],
+            )
+        self.conn.commit()
+        return found
+
+    def put_many(self, results):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (self.fingerprint, name, 1 if result else 0,
+                 result[0] if result else None, result[1] if result else None, now)
+                for name, result in results
+            ],
+        )
+        # LRU eviction down to max_entries
+        self.conn.execute(
+            "DELETE FROM matches WHERE rowid IN ("
+            "SELECT rowid FROM matches ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.conn.commit()
+
+    # Resolve every name through the cache, scoring only the misses with the matcher
+    def match_many(self, matcher, formatted_names, workers=1):
+        cached = self.get_many(formatted_names)
+        missing = [name for name in dict.fromkeys(formatted_names) if name not in cached]
+        self.hits += len(cached)
+        self.misses += len(missing)
+
+        if missing:
+            computed = matcher.match_many(missing, workers=workers)
+            self.put_many(zip(missing, computed))
+            cached.update(zip(missing, computed))
+        return [cached[name] for name in formatted_names]
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,179 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Where finished jobs write their run reports (unset = not written). The
+# Prometheus file is meant for node_exporter's textfile collector.
+METRICS_JSON_PATH = os.environ.get("EMAILGEN_METRICS_JSON")
+METRICS_PROM_PATH = os.environ.get("EMAILGEN_METRICS_PROM")
+
+# Prefix of every exported Prometheus metric
+METRICS_PREFIX = "emailgen"
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Cache hit ratios reported from (hits, misses) counter pairs
+CACHE_RATIOS = {
+    "match_cache": ("match_cache_hits", "match_cache_misses"),
+    "verification_store": ("verification_store_hits", "verification_store_misses"),
+    "pattern_index": ("pattern_index_hits", "pattern_index_misses"),
+}
+
+
+# Cumulative-bucket histogram in the Prometheus layout
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    # Smallest bucket bound holding the q-th quantile, None if empty
+    def quantile(self, q):
+        if not self.count:
+            return None
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= q * self.count:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.counts)},
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+
+# Stage timers, counters and histograms of one process. Cheap enough for the
+# hot path: a lock and a dict update per call, no formatting or I/O until a
+# report is written. Shared by every job in the process (jobs run on threads).
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}      # stage -> [seconds, calls]
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            totals = self.stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+
+    # with metrics.timed("match"): ... adds the block's wall time to the stage
+    @contextlib.contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def ratios(self):
+        ratios = {}
+        for name, (hits_name, misses_name) in CACHE_RATIOS.items():
+            hits = self.counters.get(hits_name, 0)
+            total = hits + self.counters.get(misses_name, 0)
+            if total:
+                ratios[name] = round(hits / total, 4)
+        return ratios
+
+    # JSON-friendly run report
+    def report(self):
+        with self.lock:
+            return {
+                "started_at": self.started,
+                "elapsed_s": round(time.time() - self.started, 3),
+                "stages": {stage: {"seconds": round(seconds, 6), "calls": calls}
+                           for stage, (seconds, calls) in sorted(self.stages.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "cache_hit_ratios": self.ratios(),
+                "histograms": {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+            }
+
+    # Prometheus text exposition format
+    def prometheus(self, prefix=METRICS_PREFIX):
+        with self.lock:
+            lines = [f"# TYPE {prefix}_stage_seconds_total counter",
+                     f"# TYPE {prefix}_stage_calls_total counter"]
+            for stage, (seconds, calls) in sorted(self.stages.items()):
+                lines.append(f'{prefix}_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}')
+                lines.append(f'{prefix}_stage_calls_total{{stage="{stage}"}} {calls}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+            for name, ratio in sorted(self.ratios().items()):
+                lines.append(f"# TYPE {prefix}_{name}_hit_ratio gauge")
+                lines.append(f"{prefix}_{name}_hit_ratio {ratio}")
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f"{prefix}_{name}_sum {histogram.sum:.6f}")
+                lines.append(f"{prefix}_{name}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    # Written to a temporary file first so a scraper never reads half a file
+    def write_prometheus(self, path):
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(temporary, path)
+
+    # Write whichever reports have a path; defaults come from the environment
+    def write_reports(self, json_path=None, prom_path=None):
+        json_path = json_path or METRICS_JSON_PATH
+        prom_path = prom_path or METRICS_PROM_PATH
+        if json_path:
+            self.write_json(json_path)
+        if prom_path:
+            self.write_prometheus(prom_path)
+
+
+_metrics = Metrics()
+
+
+# Metrics of the current run
+def get_metrics():
+    return _metrics
+
+
+# Start a fresh set of metrics, e.g. at the start of a batch run
+def reset_metrics():
+    global _metrics
+    _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,56 @@
+import re
+from functools import lru_cache
+import unidecode
+
+# Words dropped from company names before matching
+LEGAL_SUFFIXES = frozenset(['inc', 'llc', 'corp', 'corporation', 'company', 'limited', 'ltd'])
+
+# Distinct company / name strings remembered between calls
+NORMALIZE_MEMO_SIZE = 65536
+
+# unidecode transliterates one character at a time, so its output for the
+# Latin ranges can be baked into a str.translate table. Anything the table
+# does not cover is still handed to unidecode.
+_FOLD_TABLE = {code: unidecode.unidecode(chr(code)) for code in range(0x80, 0x250)}
+
+# Characters stripped after folding, compiled once
+_COMPANY_STRIP_RE = re.compile(r'[^a-zA-Z\s]')
+_NAME_STRIP_RE = re.compile(r'[^a-zA-Z]')
+_HYPHENATED_NAME_STRIP_RE = re.compile(r'[^a-zA-Z-]')
+_HYPHEN_RUN_RE = re.compile(r'-+')
+
+
+# Same result as unidecode.unidecode, without the per-character lookup for
+# plain ASCII and accented Latin text
+def fold_ascii(text):
+    if text.isascii():
+        return text
+    folded = text.translate(_FOLD_TABLE)
+    if folded.isascii():
+        return folded
+    return unidecode.unidecode(text)
+
+
+# Function to clean and format company names into domains
+def format_company_name(company_name):
+    if not isinstance(company_name, str):
+        return ''
+    return _format_company_name(company_name)
+
+
+@lru_cache(maxsize=NORMALIZE_MEMO_SIZE)
+def _format_company_name(company_name):
+    words = _COMPANY_STRIP_RE.sub('', fold_ascii(company_name)).lower().split()
+    return ''.join(word for word in words if word not in LEGAL_SUFFIXES)
+
+
+# Function to remove accents and special characters from names
+@lru_cache(maxsize=NORMALIZE_MEMO_SIZE)
+def clean_name(name):
+    return _NAME_STRIP_RE.sub('', fold_ascii(name)).lower()
+
+
+# Same as clean_name, but keeps inner hyphens (Jean-Philippe -> jean-philippe)
+def clean_hyphenated_name(name):
+    clean_name = _HYPHENATED_NAME_STRIP_RE.sub('', fold_ascii(name))
+    return _HYPHEN_RUN_RE.sub('-', clean_name).strip('-').lower()
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import sqlite3
+from gspread.utils import numericise
+from email_templates import compile_pattern
+from match_cache import pattern_fingerprint
+from metrics import get_metrics
+from name_normalizer import format_company_name
+from pattern_matcher import PatternMatcher, ProcessPoolMatcher, normalize_key
+
+# Local snapshot of the indexed "Email Patterns" tab
+PATTERN_INDEX_PATH = "pattern_index.sqlite3"
+
+# Bytes of the snapshot SQLite reads through a memory map instead of read() calls
+PATTERN_INDEX_MMAP_BYTES = 256 * 1024 * 1024
+
+# Email Patterns columns an index entry is derived from, in the order they are hashed
+PATTERN_COLUMNS = ("domain", "Organization", "email_pattern")
+
+# Separate the column values of a row, and the rows of the tab, in hashed text
+FIELD_SEPARATOR = "\x1f"
+ROW_SEPARATOR = "\x1e"
+
+
+# Index entry for one Email Patterns row: (organization, pattern, domain,
+# match key, warning). organization is None for a row load_email_structures
+# would skip, with the warning it logs for an invalid pattern.
+def index_row(domain, organization, email_pattern):
+    domain, organization, email_pattern = numericise(domain), numericise(organization), numericise(email_pattern)
+    if not organization or not isinstance(organization, str):
+        return None, None, None, None, None
+    try:
+        compile_pattern(email_pattern)
+    except ValueError as e:
+        return None, None, None, None, f"Email pattern for '{organization}' skipped: {e}"
+    organization = format_company_name(organization)
+    return organization, email_pattern, domain, normalize_key(organization), None
+
+
+# The Email Patterns table as load_email_structures builds it, plus the
+# normalized key of every organization so matchers skip normalize_key
+class PatternIndex:
+    __slots__ = ('email_structures', 'keys', 'fingerprint', 'reindexed', 'removed')
+
+    def __init__(self, email_structures, keys, fingerprint, reindexed=0, removed=0):
+        self.email_structures = email_structures
+        self.keys = keys                # organization -> normalize_key(organization)
+        self.fingerprint = fingerprint  # pattern_fingerprint(email_structures), for MatchCache
+        self.reindexed = reindexed      # rows indexed on this load (0 = snapshot reused)
+        self.removed = removed          # snapshot rows no longer in the tab
+
+    def matcher(self, workers=1):
+        if workers > 1:
+            return ProcessPoolMatcher(self.email_structures, workers, self.keys)
+        return PatternMatcher(self.email_structures, self.keys)
+
+
+# SQLite snapshot of the indexed Email Patterns tab. Every raw row maps to its
+# index entry, and the assembled table is stored under a hash of the tab's
+# contents: an unchanged tab loads with one query, an edited one only indexes
+# the rows whose values are new. Rows are read from the sheet each time, as
+# neither backend has a per-tab revision to check instead.
+class PatternIndexStore:
+    def __init__(self, path=PATTERN_INDEX_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(f"PRAGMA mmap_size = {PATTERN_INDEX_MMAP_BYTES}")
+        # Untyped columns keep numericised values as they are
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS rows (
+                   raw TEXT PRIMARY KEY,
+                   organization,
+                   pattern,
+                   domain,
+                   match_key TEXT,
+                   warning TEXT
+               )"""
+        )
+        # The email_structures of the last loaded tab, in order
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                   position INTEGER PRIMARY KEY,
+                   organization,
+                   pattern,
+                   domain,
+                   match_key TEXT
+               )"""
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS snapshot (name TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _snapshot(self):
+        return dict(self.conn.execute("SELECT name, value FROM snapshot"))
+
+    # PatternIndex of the tab's rows (get_all_values layout, header first)
+    def load(self, values):
+        metrics = get_metrics()
+        headers = values[0] if values else []
+        if not all(column in headers for column in PATTERN_COLUMNS):
+            return PatternIndex({}, {}, pattern_fingerprint({}))
+        positions = [headers.index(column) for column in PATTERN_COLUMNS]
+        raws = [FIELD_SEPARATOR.join(row[position] if position < len(row) else "" for position in positions)
+                for row in values[1:]]
+        content_hash = hashlib.sha256(ROW_SEPARATOR.join(raws).encode("utf-8")).hexdigest()
+
+        snapshot = self._snapshot()
+        if snapshot.get("content_hash") == content_hash:
+            metrics.increment("pattern_index_hits")
+            for warning in json.loads(snapshot["warnings"]):
+                logging.warning(warning)
+            email_structures = {}
+            keys = {}
+            for organization, pattern, domain, match_key in self.conn.execute(
+                    "SELECT organization, pattern, domain, match_key FROM entries ORDER BY position"):
+                email_structures[organization] = (pattern, domain)
+                keys[organization] = match_key
+            return PatternIndex(email_structures, keys, snapshot["fingerprint"])
+
+        metrics.increment("pattern_index_misses")
+        known = {row[0]: row[1:] for row in self.conn.execute(
+            "SELECT raw, organization, pattern, domain, match_key, warning FROM rows")}
+        new_rows = {}
+        email_structures = {}
+        keys = {}
+        warnings = []
+        for raw in raws:
+            entry = known.get(raw) or new_rows.get(raw)
+            if entry is None:
+                entry = new_rows[raw] = index_row(*raw.split(FIELD_SEPARATOR))
+            organization, pattern, domain, match_key, warning = entry
+            if warning:
+                logging.warning(warning)
+                warnings.append(warning)
+            if organization is not None:
+                email_structures[organization] = (pattern, domain)
+                keys[organization] = match_key
+        stale = known.keys() - set(raws)
+        metrics.increment("pattern_index_rows_indexed", len(new_rows))
+
+        fingerprint = pattern_fingerprint(email_structures)
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(raw,) + entry for raw, entry in new_rows.items()])
+            self.conn.executemany("DELETE FROM rows WHERE raw = ?", [(raw,) for raw in stale])
+            self.conn.execute("DELETE FROM entries")
+            self.conn.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?)",
+                [(position, organization, pattern, domain, keys[organization])
+                 for position, (organization, (pattern, domain)) in enumerate(email_structures.items())])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO snapshot VALUES (?, ?)",
+                [("content_hash", content_hash), ("fingerprint", fingerprint),
+                 ("warnings", json.dumps(warnings))])
+        logging.info(f"Pattern index: {len(new_rows)} rows indexed, {len(stale)} removed")
+        return PatternIndex(email_structures, keys, fingerprint, len(new_rows), len(stale))
+
+
+# PatternIndex of the "Email Patterns" tab, through the local snapshot
+def load_pattern_index(email_patterns_sheet, path=PATTERN_INDEX_PATH):
+    values = email_patterns_sheet.get_all_values()
+    store = PatternIndexStore(path)
+    try:
+        return store.load(values)
+    finally:
+        store.close()
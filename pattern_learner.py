@@ -0,0 +1,171 @@
+import logging
+from collections import Counter, defaultdict
+from itertools import permutations
+from email_generator import load_email_structures
+from email_templates import compile_pattern
+from email_verification import VALIDATION_HEADERS
+from name_normalizer import clean_name, format_company_name
+from storage import get_worksheet
+from verification_store import VerificationStore
+
+# A learned pattern is only written when at least this many valid addresses
+# fit it, none fits only another pattern, and this share of the valid
+# addresses at the domain fit it
+PATTERN_MIN_SUPPORT = 2
+PATTERN_MIN_CONFIDENCE = 0.75
+
+# Personal mailboxes say nothing about an employer's address format
+WEBMAIL_DOMAINS = frozenset([
+    "gmail.com", "googlemail.com", "yahoo.com", "outlook.com", "hotmail.com", "live.com",
+    "icloud.com", "me.com", "aol.com", "protonmail.com", "proton.me", "gmx.com", "gmx.de",
+])
+
+# Header of a new "Email Patterns" tab, in the layout of the existing one
+EMAIL_PATTERNS_HEADERS = ["domain", "Organization", "email_pattern"]
+
+# Name placeholders History rows can be explained with (they only keep the
+# first two words of the name, so middle names and hyphens cannot be learned)
+NAME_PLACEHOLDERS = ["{firstname}", "{lastname}", "{firstinitial}", "{lastinitial}"]
+SEPARATORS = [".", "", "_", "-"]
+
+
+# Every single-name and two-part pattern in the tab's placeholder style,
+# e.g. {firstname}.{lastname}@{domain} or {firstinitial}{lastname}@{domain}
+def _candidate_patterns():
+    patterns = ["{firstname}@{domain}", "{lastname}@{domain}"]
+    for first_part, second_part in permutations(NAME_PLACEHOLDERS, 2):
+        # A name next to its own initial is never a real format
+        if {first_part, second_part} in ({"{firstname}", "{firstinitial}"}, {"{lastname}", "{lastinitial}"}):
+            continue
+        for separator in SEPARATORS:
+            patterns.append(f"{first_part}{separator}{second_part}@{{domain}}")
+    return patterns
+
+
+CANDIDATE_PATTERNS = _candidate_patterns()
+
+
+# What inference concluded for one domain
+class LearnedPattern:
+    __slots__ = ('domain', 'pattern', 'confidence', 'support', 'agreeing', 'conflicting', 'organizations')
+
+    def __init__(self, domain, pattern, confidence, support, agreeing, conflicting, organizations):
+        self.domain = domain
+        self.pattern = pattern
+        self.confidence = confidence      # share of the domain's valid addresses the pattern explains
+        self.support = support            # valid addresses seen at the domain
+        self.agreeing = agreeing          # valid addresses the pattern explains
+        self.conflicting = conflicting    # valid addresses only other candidate patterns explain
+        self.organizations = organizations  # company names seen at the domain, most common first
+
+
+# Candidate patterns that turn the name into exactly this address
+def patterns_for_address(first_name, last_name, email):
+    first = clean_name(first_name)
+    last = clean_name(last_name)
+    if not first or not last:
+        return []
+    email = email.strip().lower()
+    values = {
+        'first': first,
+        'last': last,
+        'first_initial': first[0],
+        'last_initial': last[0],
+        'domain': email.rpartition("@")[2],
+    }
+    return [pattern for pattern in CANDIDATE_PATTERNS if compile_pattern(pattern).render(values) == email]
+
+
+# One LearnedPattern per company domain from (first_name, last_name, email,
+# company) of valid addresses. Each address votes for the patterns that
+# explain it; an ambiguous address (e.g. a one-letter first name) splits its
+# vote, so it counts for less.
+def infer_patterns(valid_contacts):
+    votes = defaultdict(Counter)
+    matched = defaultdict(list)  # domain -> candidate patterns of each address some pattern explains
+    support = Counter()
+    organizations = defaultdict(Counter)
+
+    for first_name, last_name, email, company in valid_contacts:
+        email = email.strip().lower()
+        domain = email.rpartition("@")[2]
+        if not domain or domain in WEBMAIL_DOMAINS:
+            continue
+        support[domain] += 1
+        company = company.strip()
+        if company:
+            organizations[domain][company] += 1
+        matches = patterns_for_address(first_name, last_name, email)
+        if matches:
+            matched[domain].append(matches)
+        for pattern in matches:
+            votes[domain][pattern] += 1 / len(matches)
+
+    learned = []
+    for domain, domain_votes in votes.items():
+        # Ties go to the more common format (CANDIDATE_PATTERNS order)
+        pattern = max(domain_votes, key=lambda p: (domain_votes[p], -CANDIDATE_PATTERNS.index(p)))
+        agreeing = sum(pattern in matches for matches in matched[domain])
+        learned.append(LearnedPattern(domain, pattern, domain_votes[pattern] / support[domain], support[domain],
+                                      agreeing, len(matched[domain]) - agreeing,
+                                      [company for company, _ in organizations[domain].most_common()]))
+    return sorted(learned, key=lambda entry: entry.domain)
+
+
+# Learn patterns from History and append the confident ones for new domains
+# to "Email Patterns", one row per company name seen at the domain. History
+# is read through the verification store, so only rows appended since its
+# last sync are downloaded. Domains and organizations already in the tab are
+# left alone, so hand-entered patterns always win, and only the new rows are
+# written; matchers pick them up the next time the tab is loaded.
+def learn_patterns(min_confidence=PATTERN_MIN_CONFIDENCE, min_support=PATTERN_MIN_SUPPORT, dry_run=False,
+                   progress=None):
+    history_sheet = get_worksheet("History")
+    email_patterns_sheet = get_worksheet("Email Patterns")
+
+    store = VerificationStore()
+    try:
+        store.sync_history(history_sheet, VALIDATION_HEADERS)
+        valid_contacts = store.valid_contacts()
+    finally:
+        store.close()
+    if not valid_contacts:
+        return "No valid addresses found in 'History' sheet."
+    learned = infer_patterns(valid_contacts)
+    if progress:
+        progress(len(valid_contacts), len(valid_contacts), domains=len(learned))
+
+    email_structures = load_email_structures(email_patterns_sheet)
+    known_domains = {str(domain).strip().lower() for _, domain in email_structures.values()}
+    headers = email_patterns_sheet.row_values(1) or EMAIL_PATTERNS_HEADERS
+
+    new_rows = []
+    new_structures = {}
+    weak = 0
+    for entry in learned:
+        if entry.domain in known_domains:
+            continue
+        if entry.confidence < min_confidence or entry.agreeing < min_support or entry.conflicting:
+            weak += 1
+            logging.info(f"Pattern for {entry.domain} not learned: {entry.pattern} fits {entry.agreeing} "
+                         f"({entry.confidence:.0%}) of {entry.support} addresses, "
+                         f"{entry.conflicting} fit only another pattern")
+            continue
+        for organization in entry.organizations:
+            key = format_company_name(organization)
+            if not key or key in email_structures or key in new_structures:
+                continue
+            new_structures[key] = (entry.pattern, entry.domain)
+            values = {"domain": entry.domain, "Organization": organization, "email_pattern": entry.pattern}
+            new_rows.append([values.get(header, "") for header in headers])
+
+    summary = (f"{len(new_rows)} patterns learned for {len({d for _, d in new_structures.values()})} "
+               f"new domains ({weak} domains below the confidence bar).")
+    if dry_run:
+        return f"Dry run: {summary}"
+
+    if new_rows:
+        if not email_patterns_sheet.row_values(1):
+            new_rows.insert(0, headers)
+        email_patterns_sheet.append_rows(new_rows, value_input_option="RAW")
+    return summary
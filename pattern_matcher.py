@@ -0,0 +1,162 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Levenshtein import ratio
+from fuzzywuzzy import utils
+from rapidfuzz import fuzz, process
+
+# find_best_match only accepts fuzz.token_sort_ratio scores strictly above this
+MATCH_THRESHOLD = 80
+
+# Contacts scored per cdist call, bounds the similarity matrix to rows x organizations
+MATCH_CHUNK_ROWS = 512
+
+# Shards handed to each process by ProcessPoolMatcher, for load balancing
+POOL_SHARDS_PER_PROCESS = 4
+
+# How ProcessPoolMatcher starts its workers. Not fork: the app server has
+# other threads running, and a forked child can inherit their locks held.
+POOL_START_METHOD = "spawn"
+
+# Queries this long could tie a non-identical key at 100, so they skip the exact fast path
+EXACT_FAST_PATH_MAX_LEN = 80
+
+
+# Normalize a string the same way process.extract + fuzz.token_sort_ratio do
+def normalize_key(text):
+    tokens = utils.full_process(text, force_ascii=True).split()
+    return ' '.join(sorted(tokens))
+
+
+# Score two normalized keys exactly like fuzz.token_sort_ratio
+def score_keys(a, b):
+    if a == b:
+        return 100
+    if not a or not b:
+        return 0
+    return int(round(100 * ratio(a, b)))
+
+
+# Matcher built once per run from the {organization: (pattern, domain)} mapping.
+# Scores whole batches of company names against every organization in native
+# code (rapidfuzz.process.cdist) and gives the same answers as the old
+# process.extract / token_sort_ratio scan, including ties broken by sheet order.
+# There is no trigram pre-filter in front of cdist: at the 80 threshold the
+# shared-trigram bound is never positive for keys of similar length, so it
+# only narrows by length, which cdist's score cutoff already skips natively.
+# `keys` ({organization: normalize_key(organization)}, e.g. from the pattern
+# index snapshot) saves normalizing every organization again.
+class PatternMatcher:
+    def __init__(self, email_structures, keys=None):
+        self.keys = []          # normalized keys, in email_structures order
+        self.values = []        # (pattern, domain) for each key
+        self.exact = {}         # normalized key -> position of its first occurrence
+        self.extend(email_structures, keys)
+
+    # Index more organizations after the existing ones; earlier entries still win ties
+    def extend(self, email_structures, keys=None):
+        for organization, value in email_structures.items():
+            # 'Unmatched' rows are never valid targets
+            if value[0] == 'Unmatched':
+                continue
+            key = keys[organization] if keys else normalize_key(organization)
+            self.exact.setdefault(key, len(self.keys))
+            self.keys.append(key)
+            self.values.append(value)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _cdist(self, queries, workers):
+        # Cells below the cutoff come back as 0; the cutoff is slightly loose
+        # because fuzzywuzzy rounds before comparing against the threshold
+        return process.cdist(queries, self.keys, scorer=fuzz.ratio,
+                             score_cutoff=MATCH_THRESHOLD, workers=workers)
+
+    # contacts x organizations similarity matrix for a batch of formatted company names
+    def score_matrix(self, formatted_names, workers=1):
+        queries = [normalize_key(name) for name in formatted_names]
+        if not queries or not self.keys:
+            return np.zeros((len(queries), len(self.keys)), dtype=np.float32)
+        return self._cdist(queries, workers)
+
+    # Up to `limit` (position, score) pairs above the threshold for each name,
+    # best first. workers=-1 uses every core.
+    def top_matches(self, formatted_names, limit=1, workers=1):
+        queries = [normalize_key(name) for name in formatted_names]
+        results = [[] for _ in queries]
+
+        pending = []
+        for row, query in enumerate(queries):
+            position = self.exact.get(query)
+            # Queries this short cannot tie a different key at 100
+            if limit == 1 and position is not None and len(query) < EXACT_FAST_PATH_MAX_LEN:
+                results[row] = [(position, 100)]
+            else:
+                pending.append(row)
+
+        if not self.keys:
+            return results
+
+        for start in range(0, len(pending), MATCH_CHUNK_ROWS):
+            rows = pending[start:start + MATCH_CHUNK_ROWS]
+            scores = self._cdist([queries[row] for row in rows], workers)
+            for row, row_scores in zip(rows, scores):
+                query = queries[row]
+                # Re-score the few survivors with the exact rounded score
+                ranked = []
+                for position in np.flatnonzero(row_scores):
+                    score = score_keys(query, self.keys[position])
+                    if score > MATCH_THRESHOLD:
+                        ranked.append((int(position), score))
+                ranked.sort(key=lambda item: (-item[1], item[0]))
+                results[row] = ranked[:limit]
+        return results
+
+    # Best (pattern, domain) or None for each formatted company name
+    def match_many(self, formatted_names, workers=1):
+        return [self.values[top[0][0]] if top else None
+                for top in self.top_matches(formatted_names, workers=workers)]
+
+    # Best (pattern, domain) for a single formatted company name, or None
+    def match(self, formatted_name):
+        return self.match_many([formatted_name])[0]
+
+
+# Pattern index of a ProcessPoolMatcher worker, built once by the pool initializer
+_worker_matcher = None
+
+
+def _init_pool_worker(email_structures, keys):
+    global _worker_matcher
+    _worker_matcher = PatternMatcher(email_structures, keys)
+
+
+def _match_shard(formatted_names):
+    return _worker_matcher.match_many(formatted_names)
+
+
+# PatternMatcher.match_many spread over worker processes. Each worker indexes
+# email_structures once at start-up; only company names and results cross
+# the process boundary. Results are the same as PatternMatcher's, in order.
+# cdist(workers=-1) alone only spreads the scoring; normalizing the names and
+# re-scoring the survivors (about a third of match_many) stays on one core,
+# which the pool spreads too.
+class ProcessPoolMatcher:
+    def __init__(self, email_structures, processes, keys=None):
+        self.processes = processes
+        self.pool = ProcessPoolExecutor(max_workers=processes,
+                                        mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                                        initializer=_init_pool_worker, initargs=(email_structures, keys))
+
+    def match_many(self, formatted_names, workers=1):
+        shard_size = max(1, -(-len(formatted_names) // (self.processes * POOL_SHARDS_PER_PROCESS)))
+        shards = [formatted_names[start:start + shard_size]
+                  for start in range(0, len(formatted_names), shard_size)]
+        return [result for shard in self.pool.map(_match_shard, shards) for result in shard]
+
+    def match(self, formatted_name):
+        return self.match_many([formatted_name])[0]
+
+    def close(self):
+        self.pool.shutdown()
@@ -0,0 +1,184 @@
+import logging
+import queue
+import threading
+from email_generator import (
+    GENERATED_HEADERS,
+    load_contacts,
+    clear_extract_sheet,
+    generate_output_rows,
+)
+from pattern_index import load_pattern_index
+from storage import get_storage, get_worksheet
+from match_cache import MatchCache
+from contact_index import CONTACT_DEDUP, ContactIndex
+from verification_store import VerificationStore
+from prefilter import PreFilter
+from hunter_verifier import count_lookups, verify_rows
+from metrics import get_metrics
+from email_verification import (
+    HUNTER_URL,
+    FLUSH_CHUNK_SIZE,
+    VALIDATION_HEADERS,
+    ensure_headers,
+    flush_results,
+    refresh_hunter_keys,
+)
+
+# Contacts matched per batch on the generation side
+PIPELINE_MATCH_CHUNK = 100
+
+# Generated rows buffered between generation and verification; generation
+# pauses when verification falls this far behind
+PIPELINE_QUEUE_SIZE = 200
+
+# How often a stopping pipeline checks whether the producer thread has exited
+PRODUCER_STOP_POLL_SECONDS = 0.1
+
+# Marks the end of the generated rows on the queue
+_DONE = object()
+
+
+# Generation stage: Extract contacts -> cleaned names -> match -> email rows.
+# Runs in its own thread, so it opens its own match cache connection. Stops
+# early once `stop` is set.
+def _generate(contacts, fingerprint, matcher, out_queue, errors, stop):
+    match_cache = MatchCache(fingerprint)
+    try:
+        for row in generate_output_rows(contacts, matcher, match_cache, PIPELINE_MATCH_CHUNK):
+            if stop.is_set():
+                return
+            out_queue.put(row)
+        logging.info(f"Match cache: {match_cache.hits} hits, {match_cache.misses} misses")
+    except Exception as e:
+        errors.append(e)
+    finally:
+        match_cache.close()
+        out_queue.put(_DONE)
+
+
+# Group queued rows into verification batches of `size`
+def _batches(in_queue, size):
+    batch = []
+    while True:
+        row = in_queue.get()
+        if row is _DONE:
+            break
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Generate and verify in one pass: rows go straight from the generator to
+# Hunter without the "Generated" tab round-trip. Verified rows are appended to
+# Validation/History in batches; rows Hunter gave no verdict for are left in
+# "Generated" for a later verifier run. `progress(done, total, verified=...,
+# credits=...)` is called after each batch with the contacts generated so far.
+# With dedup, contacts seen in earlier runs are dropped first (see contact_index).
+def run_pipeline(progress=None, dedup=CONTACT_DEDUP):
+    extract_sheet = get_worksheet(0)  # "Extract" tab
+    generated_sheet = get_worksheet(1)  # "Generated" tab
+    email_patterns_sheet = get_worksheet("Email Patterns")
+    validation_sheet = get_worksheet("Validation")
+    history_sheet = get_worksheet("History")
+    ensure_headers(validation_sheet, history_sheet)
+    metrics = get_metrics()
+
+    store = VerificationStore()
+    contact_index = ContactIndex(get_storage().key)
+    rows_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    producer = None
+    try:
+        with metrics.timed("sheet_read"):
+            store.sync_history(history_sheet, VALIDATION_HEADERS)
+        sheets = {"Validation": validation_sheet, "History": history_sheet}
+        flush_results(store, sheets)
+
+        with metrics.timed("pattern_load"):
+            pattern_index = load_pattern_index(email_patterns_sheet)
+            matcher = pattern_index.matcher()
+        with metrics.timed("sheet_read"):
+            contacts = load_contacts(extract_sheet)
+
+        if dedup:
+            with metrics.timed("sheet_read"):
+                contact_index.sync({"Generated": generated_sheet, "Validation": validation_sheet,
+                                    "History": history_sheet})
+            contacts = list(contact_index.filter_new(contacts))
+
+        keys = refresh_hunter_keys()
+        errors = []
+        producer = threading.Thread(
+            target=_generate, args=(contacts, pattern_index.fingerprint, matcher, rows_queue, errors, stop),
+            daemon=True,
+        )
+        producer.start()
+
+        email_index = GENERATED_HEADERS.index("email")
+        prefilter = PreFilter()
+        generated_count = verified_count = skipped_count = credits_used = 0
+        unverified = []
+        for batch in _batches(rows_queue, FLUSH_CHUNK_SIZE):
+            generated_count += len(batch)
+            rows_to_verify = []
+            for row in batch:
+                if store.is_fresh(row[email_index].strip()):
+                    skipped_count += 1
+                else:
+                    rows_to_verify.append(row)
+            metrics.increment("verification_store_hits", len(batch) - len(rows_to_verify))
+            metrics.increment("verification_store_misses", len(rows_to_verify))
+
+            # Malformed, placeholder, blocked and repeated addresses are settled locally
+            rows_to_verify, rejected_rows = prefilter.filter_rows(rows_to_verify, email_index)
+            for row in rejected_rows:
+                store.journal_result(row[email_index].strip(), row)
+
+            with metrics.timed("verify"):
+                verification_results = verify_rows(
+                    rows_to_verify, email_index, keys, HUNTER_URL,
+                    on_result=lambda row: store.journal_result(row[email_index].strip(), row),
+                    domain_cache=store,
+                )
+            verified_count += len(verification_results)
+            credits_used += count_lookups(verification_results)
+            metrics.increment("emails_verified", len(verification_results))
+            metrics.increment("hunter_credits", count_lookups(verification_results))
+            # Contacts only count as processed once their rows are in Validation/History
+            flushed = flush_results(store, sheets)
+            contact_index.record_rows([row for row in batch if row[email_index].strip() in flushed],
+                                      GENERATED_HEADERS)
+
+            verified_emails = {row[email_index].strip() for row in verification_results}
+            unverified.extend(row for row in rows_to_verify if row[email_index].strip() not in verified_emails)
+            print(f"Checkpoint: {generated_count} generated, {verified_count} verified.")
+            if progress:
+                progress(generated_count, len(contacts), verified=verified_count, credits=credits_used,
+                         saved=prefilter.saved)
+
+        producer.join()
+        if errors:
+            raise errors[0]
+
+        if unverified:
+            generated_sheet.append_rows(unverified, table_range='A2')
+            contact_index.record_rows(unverified, GENERATED_HEADERS)
+        clear_extract_sheet(extract_sheet)
+
+        return (f"{generated_count} emails generated, {verified_count} verified, "
+                f"{skipped_count} already verified, {len(unverified)} left in 'Generated'. "
+                f"{prefilter.summary()}" + (f" {contact_index.summary()}" if dedup else ""))
+    finally:
+        # If verification failed, tell the producer to stop and take rows off
+        # the queue until it has, so it never stays blocked on a full queue
+        stop.set()
+        while producer is not None and producer.is_alive():
+            try:
+                rows_queue.get(timeout=PRODUCER_STOP_POLL_SECONDS)
+            except queue.Empty:
+                pass
+        contact_index.close()
+        store.close()
@@ -0,0 +1,97 @@
+import os
+import re
+from collections import Counter
+
+# Optional file of extra domains never worth a lookup, one per line (# comments allowed)
+BLOCKLIST_PATH = "blocked_domains.txt"
+
+# Reserved and throwaway domains that never hold a real mailbox
+DEFAULT_BLOCKED_DOMAINS = frozenset([
+    "example.com", "example.net", "example.org", "test.com", "mailinator.com",
+])
+
+# Written by generate_email_from_pattern for a missing first or last name
+PLACEHOLDER_NAME = "unknown"
+
+# Status written for rows the filter rejects, like hunter_verifier.DERIVED_STATUSES
+PREFILTER_STATUSES = {
+    "syntax": "invalid (syntax)",
+    "placeholder": "invalid (placeholder)",
+    "blocked": "blocked (domain)",
+}
+
+# RFC 5322 dot-atom local part (without braces, which only show up as
+# unfilled pattern placeholders) and an RFC 1035 hostname with a letter TLD
+_LOCAL_PART = r"[A-Za-z0-9!#$%&'*+/=?^_`|~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`|~-]+)*"
+_DOMAIN = r"(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}"
+EMAIL_RE = re.compile(rf"{_LOCAL_PART}@{_DOMAIN}")
+
+
+def load_blocklist(path=BLOCKLIST_PATH):
+    domains = set(DEFAULT_BLOCKED_DOMAINS)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                domain = line.split("#", 1)[0].strip().lower()
+                if domain:
+                    domains.add(domain)
+    return frozenset(domains)
+
+
+# Cheap local checks in front of the Hunter verifier. Keeps the addresses seen
+# during a run, so an address repeated across rows or batches is looked up once.
+class PreFilter:
+    def __init__(self, blocked_domains=None):
+        self.blocked_domains = load_blocklist() if blocked_domains is None else frozenset(blocked_domains)
+        self.seen = set()
+        self.rejected = Counter()  # reason -> lookups saved
+
+    # Why the address can never be worth a lookup ("syntax", "placeholder",
+    # "blocked"), or None. Unlike check, this does not track duplicates.
+    def hopeless(self, email):
+        if len(email) > 254 or not EMAIL_RE.fullmatch(email):
+            return "syntax"
+        local_part, domain = email.lower().rsplit("@", 1)
+        if len(local_part) > 64:
+            return "syntax"
+        if PLACEHOLDER_NAME in local_part:
+            return "placeholder"
+        if domain in self.blocked_domains:
+            return "blocked"
+        return None
+
+    # Reason the address should not be sent to Hunter, or None
+    def check(self, email):
+        reason = self.hopeless(email)
+        if reason:
+            return reason
+        if email.lower() in self.seen:
+            return "duplicate"
+        self.seen.add(email.lower())
+        return None
+
+    # Split rows into (rows to verify, rejected rows). Rejected rows come back as
+    # `row + [status, 0]` like verify_rows results; duplicates are dropped, since
+    # the first row with the address gets the verdict.
+    def filter_rows(self, rows, email_col_index):
+        to_verify = []
+        rejected = []
+        for row in rows:
+            reason = self.check(row[email_col_index].strip())
+            if reason is None:
+                to_verify.append(row)
+                continue
+            self.rejected[reason] += 1
+            if reason in PREFILTER_STATUSES:
+                rejected.append(row + [PREFILTER_STATUSES[reason], 0])
+        return to_verify, rejected
+
+    @property
+    def saved(self):
+        return sum(self.rejected.values())
+
+    def summary(self):
+        if not self.saved:
+            return "Pre-filter saved no lookups."
+        details = ", ".join(f"{count} {reason}" for reason, count in self.rejected.most_common())
+        return f"Pre-filter saved {self.saved} Hunter lookups ({details})."
@@ -0,0 +1,48 @@
+import argparse
+from storage import LOCAL_STORAGE_PATH, SYNC_TABS, LocalStorage, run_offline_generator
+
+# Offline runs on a local SQLite file instead of Google Sheets:
+#
+#   python run_offline.py generate --contacts "OLD CONTENT/contacts.csv" \
+#       --patterns "OLD CONTENT/email_structures.csv" --output generated_emails.csv
+#   python run_offline.py generate ... --no-dedup   # keep contacts generated by earlier runs
+#   python run_offline.py import "Extract" extract.csv
+#   python run_offline.py export "Validation" validation.csv
+#   python run_offline.py sync            # push Generated/Validation/History to Sheets
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local storage for offline runs")
+    parser.add_argument("--db", default=LOCAL_STORAGE_PATH, help="SQLite file holding the local tabs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Generate emails from CSV files, without Google Sheets")
+    generate.add_argument("--contacts", required=True)
+    generate.add_argument("--patterns", required=True)
+    generate.add_argument("--output", default="generated_emails.csv")
+    generate.add_argument("--no-dedup", action="store_true",
+                          help="Also generate contacts already generated into this --db")
+
+    import_parser = commands.add_parser("import", help="Replace a local tab with a CSV file")
+    import_parser.add_argument("tab")
+    import_parser.add_argument("csv")
+
+    export_parser = commands.add_parser("export", help="Write a local tab to a CSV file")
+    export_parser.add_argument("tab")
+    export_parser.add_argument("csv")
+
+    sync_parser = commands.add_parser("sync", help="Export local tabs to the Google Sheets spreadsheet")
+    sync_parser.add_argument("tabs", nargs="*", default=list(SYNC_TABS))
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        print(run_offline_generator(args.contacts, args.patterns, args.output, args.db, dedup=not args.no_dedup))
+    else:
+        storage = LocalStorage(args.db)
+        if args.command == "import":
+            print(f"{storage.worksheet(args.tab).import_csv(args.csv)} rows imported into '{args.tab}'.")
+        elif args.command == "export":
+            print(f"{storage.worksheet(args.tab).export_csv(args.csv)} rows written to {args.csv}.")
+        else:
+            for tab, count in storage.sync_to_sheets(args.tabs).items():
+                print(f"{count} rows synced to '{tab}'.")
+        storage.close()
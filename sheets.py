@@ -0,0 +1,44 @@
+from functools import lru_cache
+import streamlit as st
+
+# Configuration
+SPREADSHEET_NAME = "Contact Creation"
+
+
+# Authenticate with Google Sheets API once per process. gspread and
+# oauth2client are only imported when a job first needs them.
+@lru_cache(maxsize=None)
+def get_gspread_client():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    scope = [
+        "https://spreadsheets.google.com/feeds",
+        "https://www.googleapis.com/auth/drive",
+    ]
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(
+        dict(st.secrets["google_sheets"]), scope
+    )
+    return gspread.authorize(creds)
+
+
+# Opening by name needs a Drive search, so the handle is kept for the process
+@lru_cache(maxsize=None)
+def get_spreadsheet(name=SPREADSHEET_NAME):
+    return get_gspread_client().open(name)
+
+
+# Worksheet handle by tab title or by index
+@lru_cache(maxsize=None)
+def get_worksheet(key, spreadsheet_name=SPREADSHEET_NAME):
+    spreadsheet = get_spreadsheet(spreadsheet_name)
+    if isinstance(key, int):
+        return spreadsheet.get_worksheet(key)
+    return spreadsheet.worksheet(key)
+
+
+# Drop every cached handle, e.g. after tabs were renamed or credentials changed
+def reset_sheet_cache():
+    get_worksheet.cache_clear()
+    get_spreadsheet.cache_clear()
+    get_gspread_client.cache_clear()
@@ -0,0 +1,358 @@
+import csv
+import json
+import os
+import sqlite3
+
+# Where the jobs read and write their tabs:
+#   "sheets" - the Google Sheets spreadsheet (default)
+#   "local"  - a SQLite file on disk, exported to Sheets or CSV afterwards
+STORAGE_BACKEND = os.environ.get("EMAILGEN_STORAGE", "sheets")
+LOCAL_STORAGE_PATH = os.environ.get("EMAILGEN_LOCAL_DB", "emailgen.sqlite3")
+
+# Tab order of the spreadsheet, so get_worksheet(0) / get_worksheet(1) mean
+# the same thing for both backends
+TAB_ORDER = ["Extract", "Generated", "Email Patterns", "Validation", "History"]
+
+# Tabs only ever appended to; sync_to_sheets sends just the rows added since
+# the last sync. Other synced tabs are mirrored (cleared and rewritten).
+APPEND_ONLY_TABS = ("Validation", "History")
+SYNC_TABS = ("Generated", "Validation", "History")
+
+# Rows per append_rows call when exporting to Google Sheets
+SYNC_CHUNK_ROWS = 5000
+
+# Rows per request when a tab is read page by page (iter_pages)
+PAGE_ROWS = 2000
+
+# Rows under the Extract header that hold no contact: the Google Sheet has a
+# second header row there, which the generator has always skipped
+EXTRACT_FILLER_ROWS = 1
+
+# Header of the Extract tab, used when importing contact CSVs in the
+# first_name/last_name/company layout of 'OLD CONTENT/contacts.csv'
+EXTRACT_HEADERS = ["Name", "Current company", "Current position", "About",
+                   "Skills 1", "Skills 2", "Skills 3", "url"]
+
+
+# Column letters (A, B, ..., AA) to a 1-based index
+def _column_index(letters):
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index
+
+
+# 1-based column index to its letters (1 -> A, 27 -> AA)
+def _column_letters(index):
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+# "A2:M" / "B3:C10" / "A5" -> (first_row, last_row or None, first_col, last_col or None), all 1-based
+def _parse_range(range_name):
+    bounds = []
+    for part in range_name.split(":"):
+        letters = part.rstrip("0123456789")
+        digits = part[len(letters):]
+        bounds.append((int(digits) if digits else None, _column_index(letters) if letters else None))
+    (first_row, first_col), (last_row, last_col) = bounds[0], bounds[-1]
+    if len(bounds) == 1:
+        last_row, last_col = first_row, first_col
+    return first_row or 1, last_row, first_col or 1, last_col
+
+
+# Cell values the way Sheets hands them back from get_all_values: text, blank for None
+def _cell(value):
+    return "" if value is None else str(value)
+
+
+# One tab of a LocalStorage file. Implements the subset of gspread's Worksheet
+# the jobs use, plus indexed lookups (find_rows) and CSV import/export.
+class LocalWorksheet:
+    # Local Extract tabs are filled from CSV files, with no second header row
+    extract_filler_rows = 0
+
+    def __init__(self, storage, title):
+        self.storage = storage
+        self.conn = storage.conn
+        self.title = title
+
+    def _rows(self, first_row=1, last_row=None):
+        query = "SELECT cells FROM cells WHERE tab = ? AND row >= ?"
+        params = [self.title, first_row]
+        if last_row is not None:
+            query += " AND row <= ?"
+            params.append(last_row)
+        return [json.loads(cells) for cells, in self.conn.execute(query + " ORDER BY row", params)]
+
+    # Last row holding values. A property, like gspread's Worksheet.row_count,
+    # but counting used rows: a local tab has no empty grid rows below them
+    @property
+    def row_count(self):
+        return self.conn.execute("SELECT COALESCE(MAX(row), 0) FROM cells WHERE tab = ?",
+                                 (self.title,)).fetchone()[0]
+
+    def row_values(self, row):
+        rows = self._rows(row, row)
+        return rows[0] if rows else []
+
+    def get_all_values(self):
+        return self._rows()
+
+    # Same records as gspread: rows padded to the sheet width, numbers numericised
+    def get_all_records(self):
+        from gspread.utils import numericise_all
+
+        rows = self._rows()
+        if not rows:
+            return []
+        width = max(len(row) for row in rows)
+        rows = [row + [""] * (width - len(row)) for row in rows]
+        return [dict(zip(rows[0], numericise_all(row))) for row in rows[1:]]
+
+    # A1 range read, e.g. get("A2:M") for every row from the second one, columns A to M
+    def get(self, range_name):
+        first_row, last_row, first_col, last_col = _parse_range(range_name)
+        values = [row[first_col - 1:last_col] for row in self._rows(first_row, last_row)]
+        # Like the Sheets API, trailing empty rows are not returned
+        while values and not any(values[-1]):
+            values.pop()
+        return values
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values])
+
+    # Bulk insert in one transaction; the Sheets-only keyword arguments are ignored
+    def append_rows(self, values, **kwargs):
+        start = self.row_count + 1
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO cells (tab, row, cells) VALUES (?, ?, ?)",
+                [(self.title, start + offset, json.dumps([_cell(value) for value in row]))
+                 for offset, row in enumerate(values)],
+            )
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM cells WHERE tab = ?", (self.title,))
+            self.conn.execute("DELETE FROM synced WHERE tab = ?", (self.title,))
+
+    # Index the column under `header` so find_rows on it is a lookup, not a scan
+    def create_index(self, header):
+        column = self.row_values(1).index(header)
+        with self.conn:
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS cells_col{column} "
+                f"ON cells (tab, json_extract(cells, '$[{column}]'))"
+            )
+
+    # (row number, values) of every row whose `header` column equals `value`
+    def find_rows(self, header, value):
+        column = self.row_values(1).index(header)
+        query = (f"SELECT row, cells FROM cells WHERE tab = ? AND json_extract(cells, '$[{column}]') = ? "
+                 f"AND row > 1 ORDER BY row")
+        return [(row, json.loads(cells)) for row, cells in self.conn.execute(query, (self.title, _cell(value)))]
+
+    # Replace the tab with the contents of a CSV file (header row included)
+    def import_csv(self, path):
+        with open(path, encoding="utf-8-sig", errors="replace", newline="") as f:
+            rows = list(csv.reader(f))
+        self.clear()
+        self.append_rows(rows)
+        return len(rows)
+
+    def export_csv(self, path):
+        rows = self.get_all_values()
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows)
+        return len(rows)
+
+
+# SQLite file holding every tab, one JSON-encoded row per record
+class LocalStorage:
+    def __init__(self, path=LOCAL_STORAGE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS cells (
+                   tab TEXT NOT NULL,
+                   row INTEGER NOT NULL,
+                   cells TEXT NOT NULL,
+                   PRIMARY KEY (tab, row)
+               )"""
+        )
+        # Rows of each tab already exported by sync_to_sheets
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS synced (tab TEXT PRIMARY KEY, last_row INTEGER NOT NULL)"
+        )
+        self.conn.commit()
+
+    # Identifies the file for the app's one-job-at-a-time lock
+    @property
+    def key(self):
+        return f"local:{os.path.abspath(self.path)}"
+
+    def worksheet(self, key):
+        return LocalWorksheet(self, TAB_ORDER[key] if isinstance(key, int) else key)
+
+    def close(self):
+        self.conn.close()
+
+    # Export step: push the local tabs to the Google Sheets spreadsheet.
+    # Append-only tabs get the rows added since the last sync, other tabs are
+    # replaced wholesale. Returns {tab: rows written}.
+    def sync_to_sheets(self, tabs=SYNC_TABS, spreadsheet_name=None):
+        from sheets import SPREADSHEET_NAME, get_worksheet
+
+        written = {}
+        for tab in tabs:
+            local = self.worksheet(tab)
+            remote = get_worksheet(tab, spreadsheet_name or SPREADSHEET_NAME)
+            rows = local.get_all_values()
+            if tab in APPEND_ONLY_TABS:
+                synced = self.conn.execute("SELECT last_row FROM synced WHERE tab = ?", (tab,)).fetchone()
+                start = synced[0] if synced else 0
+                # The header only goes out if the sheet does not have one yet
+                if start == 0 and remote.row_values(1):
+                    start = 1
+                new_rows = rows[start:]
+            else:
+                remote.clear()
+                new_rows = rows
+            for offset in range(0, len(new_rows), SYNC_CHUNK_ROWS):
+                remote.append_rows(new_rows[offset:offset + SYNC_CHUNK_ROWS], value_input_option="RAW")
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO synced VALUES (?, ?)", (tab, len(rows)))
+            written[tab] = len(new_rows)
+        return written
+
+
+# Google Sheets backend: tabs of the configured spreadsheet, through the cached handles in sheets.py
+class SheetsStorage:
+    def __init__(self, spreadsheet_name=None):
+        self.spreadsheet_name = spreadsheet_name
+
+    @property
+    def key(self):
+        from sheets import SPREADSHEET_NAME
+
+        return f"sheets:{self.spreadsheet_name or SPREADSHEET_NAME}"
+
+    def worksheet(self, key):
+        from sheets import SPREADSHEET_NAME, get_worksheet
+
+        return get_worksheet(key, self.spreadsheet_name or SPREADSHEET_NAME)
+
+
+# (first row number, rows) pages of a tab from `first_row` on, `page_rows` rows
+# and `width` columns per request, so only one page is held at a time. Works
+# with both backends (A1 range reads). Rows inside a page may come back
+# short or empty, like get_all_values rows; reading stops at the first page
+# with no values at all.
+def iter_pages(sheet, width, first_row=2, page_rows=PAGE_ROWS):
+    last_column = _column_letters(max(width, 1))
+    start = first_row
+    while True:
+        page = sheet.get(f"A{start}:{last_column}{start + page_rows - 1}")
+        if not page:
+            return
+        yield start, page
+        start += page_rows
+
+
+# Filler rows under the header of an Extract tab (0 for local tabs)
+def extract_filler_rows(sheet):
+    return getattr(sheet, "extract_filler_rows", EXTRACT_FILLER_ROWS)
+
+
+# Rows in use in a tab, header included, or None if the handle cannot tell.
+# On Google Sheets this is the length of column A (one request): row_count
+# there is the grid size, which never shrinks when the tab is cleared.
+def used_row_count(sheet):
+    if isinstance(sheet, LocalWorksheet):
+        return sheet.row_count
+    col_values = getattr(sheet, "col_values", None)
+    return len(col_values(1)) if col_values else None
+
+
+def make_storage(name=STORAGE_BACKEND, path=LOCAL_STORAGE_PATH):
+    if name == "sheets":
+        return SheetsStorage()
+    if name == "local":
+        return LocalStorage(path)
+    raise ValueError(f"Unknown storage backend: {name!r} (expected 'sheets' or 'local')")
+
+
+_storage = None
+
+
+# Backend the jobs use, created from STORAGE_BACKEND on first use
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = make_storage()
+    return _storage
+
+
+# Switch the jobs to another backend, e.g. use_storage(LocalStorage("run.sqlite3"))
+def use_storage(storage):
+    global _storage
+    _storage = storage
+    return storage
+
+
+# Worksheet handle by tab title or index from the active backend
+def get_worksheet(key):
+    return get_storage().worksheet(key)
+
+
+# A contacts CSV record as an Extract record. Records already in the Extract
+# layout ("Name", "Current company", ...) are returned as they are; the
+# first_name/last_name/company layout of the old offline script is converted.
+def to_extract_record(record):
+    if "Name" in record:
+        return record
+    values = [f"{record.get('first_name') or ''} {record.get('last_name') or ''}".strip(),
+              record.get("company") or "", record.get("position") or "", "", "", "", "",
+              record.get("url") or ""]
+    return dict(zip(EXTRACT_HEADERS, values))
+
+
+# Load a contacts CSV (either layout, see to_extract_record) into the Extract tab
+def import_contacts_csv(storage, path):
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as f:
+        reader = csv.DictReader(f)
+        headers = reader.fieldnames if "Name" in (reader.fieldnames or []) else EXTRACT_HEADERS
+        rows = [[record.get(header) or "" for header in headers] for record in map(to_extract_record, reader)]
+    extract_sheet = storage.worksheet("Extract")
+    extract_sheet.clear()
+    extract_sheet.append_rows([headers] + rows)
+    return len(rows)
+
+
+# The offline flow of 'OLD CONTENT/generate_emails(LOCAL).py' on the current
+# generator: contacts and patterns from CSV, generated rows back to CSV.
+# With dedup, contacts already generated into this local file are skipped.
+def run_offline_generator(contacts_csv, patterns_csv, output_csv, path=LOCAL_STORAGE_PATH, dedup=None):
+    from contact_index import CONTACT_DEDUP
+    from email_generator import GENERATED_HEADERS, run_email_generator
+
+    storage = LocalStorage(path)
+    previous = _storage
+    use_storage(storage)
+    try:
+        storage.worksheet("Email Patterns").import_csv(patterns_csv)
+        import_contacts_csv(storage, contacts_csv)
+        generated_sheet = storage.worksheet("Generated")
+        generated_sheet.clear()
+        generated_sheet.append_row(GENERATED_HEADERS)
+        message = run_email_generator(dedup=CONTACT_DEDUP if dedup is None else dedup)
+        generated_sheet.export_csv(output_csv)
+    finally:
+        use_storage(previous)
+        storage.close()
+    return message
+
@@ -0,0 +1,55 @@
+import candidate_verifier
+from candidate_verifier import EMAIL, row_candidates, verify_candidates
+from email_generator import UNMATCHED_STATUS, fallback_candidates
+
+
+class FakeStore:
+    def __init__(self):
+        self.patterns = {}
+
+    def learned_pattern(self, domain):
+        return self.patterns.get(domain)
+
+    def record_pattern(self, domain, pattern):
+        self.patterns[domain] = pattern
+
+
+def unmatched_row(first, last, company):
+    email = fallback_candidates(first, last, company)[0][1]
+    return [first, last, email, company, "", "", "", "", "", "", UNMATCHED_STATUS]
+
+
+# verify_rows stand-in answering each guess with `verdicts(email, call)`
+def fake_verify_rows(monkeypatch, verdicts):
+    calls = []
+
+    def verify_rows(rows, email_col_index, *args, **kwargs):
+        calls.append([row[email_col_index] for row in rows])
+        return [row + verdicts(row[email_col_index], len(calls)) for row in rows]
+
+    monkeypatch.setattr(candidate_verifier, "verify_rows", verify_rows)
+    return calls
+
+
+def test_catch_all_after_first_guess_keeps_first_ranked_guess(monkeypatch):
+    row = unmatched_row("Ann", "Lee", "Acme")
+    ranked = [email for _, email in row_candidates(row)]
+    # The first guess is invalid; the domain then turns out to be catch-all
+    calls = fake_verify_rows(monkeypatch, lambda email, call: ["invalid", 0] if call == 1 else ["accept_all", 70])
+    resolved, stats = verify_candidates([row], "key", "url", FakeStore())
+    assert calls == [ranked[:1], ranked[1:2]]
+    assert resolved[0][1][EMAIL] == ranked[0]
+    assert resolved[0][1][-2:] == ["accept_all", 70]
+    assert stats["found"] == 0
+
+
+def test_valid_guess_wins_and_is_learned(monkeypatch):
+    row = unmatched_row("Ann", "Lee", "Acme")
+    ranked = row_candidates(row)
+    pattern, winner = ranked[2]
+    fake_verify_rows(monkeypatch, lambda email, call: ["valid", 95] if email == winner else ["invalid", 0])
+    store = FakeStore()
+    resolved, stats = verify_candidates([row], "key", "url", store)
+    assert resolved[0][1][EMAIL] == winner
+    assert stats["found"] == 1
+    assert store.learned_pattern(winner.rpartition("@")[2]) == pattern
@@ -0,0 +1,42 @@
+import pytest
+from email_generator import build_output_row, generate_email_from_pattern
+from email_templates import compile_pattern
+
+
+def email_for(name, pattern, domain="acme.com"):
+    row = build_output_row(0, {"Name": name, "Current company": "Acme"}, (pattern, domain))
+    return row[2]
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("{first}.{m}.{last}@{domain}", "john.smith@acme.com"),
+    ("{f}{m}{last}@{domain}", "jsmith@acme.com"),
+    ("{m}.{last}@{domain}", "smith@acme.com"),
+    ("{first}_{middleinitial}@{domain}", "john@acme.com"),
+])
+def test_middle_initial_dropped_for_two_word_name(pattern, expected):
+    assert email_for("John Smith", pattern) == expected
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("{first}.{m}.{last}@{domain}", "john.q.smith@acme.com"),
+    ("{f}{m}{last}@{domain}", "jqsmith@acme.com"),
+    ("{m}.{last}@{domain}", "q.smith@acme.com"),
+])
+def test_middle_initial_and_last_name_for_three_word_name(pattern, expected):
+    assert email_for("John Quincy Smith", pattern) == expected
+
+
+def test_four_word_name_takes_first_middle_and_final_last_name():
+    assert email_for("John Quincy Adams Smith", "{first}.{m}.{last}@{domain}") == "john.q.smith@acme.com"
+
+
+def test_empty_middle_never_leaves_doubled_separator():
+    for pattern in ("{first}.{m}.{last}@{domain}", "{first}-{m}-{last}@{domain}", "{first}_{m}_{last}@{domain}"):
+        email = generate_email_from_pattern("john", "smith", pattern, "acme.com")
+        assert ".." not in email and "--" not in email and "__" not in email
+
+
+def test_without_middle_only_for_middle_patterns():
+    assert compile_pattern("{first}.{last}@{domain}").without_middle is None
+    assert compile_pattern("{first}.{m}.{last}@{domain}").without_middle.pattern == "{first}.{last}@{domain}"
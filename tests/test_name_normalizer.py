@@ -0,0 +1,57 @@
+import random
+import re
+import pytest
+import unidecode
+from name_normalizer import clean_hyphenated_name, clean_name, fold_ascii, format_company_name
+
+
+# The normalizers as they were before the memoized module, for comparison
+def reference_format_company_name(company_name):
+    if not isinstance(company_name, str):
+        return ''
+    common_words = ['inc', 'llc', 'corp', 'corporation', 'company', 'limited', 'ltd']
+    words = re.sub(r'[^a-zA-Z\s]', '', unidecode.unidecode(company_name)).lower().split()
+    return ''.join(word for word in words if word not in common_words)
+
+
+def reference_clean_name(name):
+    return re.sub(r'[^a-zA-Z]', '', unidecode.unidecode(name)).lower()
+
+
+def reference_clean_hyphenated_name(name):
+    clean = re.sub(r'[^a-zA-Z-]', '', unidecode.unidecode(name))
+    return re.sub(r'-+', '-', clean).strip('-').lower()
+
+
+SAMPLES = [
+    "", "   ", "Acme Inc.", "ACME Holdings Ltd", "Société Générale", "Nestlé S.A.", "Müller & Söhne GmbH",
+    "Ørsted A/S", "Łukasz", "José-María", "--Jean--Philippe--", "O'Brien", "Zoë", "Ångström Corp",
+    "北京公司", "Ελληνικά", "Straße", "Æther Company Limited", "The LLC Group", "ﬁnance", "İstanbul", "ñandú",
+    "Smith & Co", "Co-operative Bank", "Incorporated Inc", "corp corp", "Ltd.",
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_samples_match_reference(text):
+    assert fold_ascii(text) == unidecode.unidecode(text)
+    assert format_company_name(text) == reference_format_company_name(text)
+    assert clean_name(text) == reference_clean_name(text)
+    assert clean_hyphenated_name(text) == reference_clean_hyphenated_name(text)
+
+
+def test_random_text_matches_reference():
+    rnd = random.Random(0)
+    alphabet = ("abcXYZ -.'&/" + "".join(chr(code) for code in range(0xC0, 0x250))
+                + "ßΩЖ中ﬁ" + "́")
+    for _ in range(2000):
+        text = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 20)))
+        assert format_company_name(text) == reference_format_company_name(text)
+        assert clean_name(text) == reference_clean_name(text)
+        assert clean_hyphenated_name(text) == reference_clean_hyphenated_name(text)
+
+
+def test_known_values():
+    assert format_company_name("Acme Holdings, Inc.") == "acmeholdings"
+    assert format_company_name(None) == ""
+    assert clean_name("José") == "jose"
+    assert clean_hyphenated_name("Jean--Philippe-") == "jean-philippe"
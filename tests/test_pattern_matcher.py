@@ -0,0 +1,83 @@
+import random
+import pytest
+from fuzzywuzzy import fuzz
+from pattern_matcher import MATCH_THRESHOLD, PatternMatcher
+
+# Email Patterns rows in sheet order, keyed by formatted organization
+EMAIL_STRUCTURES = {
+    "northwindtraders": ("{first}.{last}@{domain}", "northwind.com"),
+    "acmeholdings": ("{f}{last}@{domain}", "acme-a.com"),
+    "acmeholdingz": ("{first}@{domain}", "acme-z.com"),
+    "contoso": ("{first}_{last}@{domain}", "contoso.com"),
+    "fabrikam": ("Unmatched", "fabrikam.com"),
+    "globexcorporation": ("{last}@{domain}", "globex.com"),
+}
+
+
+# The scan PatternMatcher replaces: highest token_sort_ratio above the
+# threshold, the first organization in sheet order on ties
+def reference_match(name, email_structures):
+    best, best_score = None, MATCH_THRESHOLD
+    for organization, value in email_structures.items():
+        if value[0] == "Unmatched":
+            continue
+        score = fuzz.token_sort_ratio(name, organization)
+        if score > best_score:
+            best, best_score = value, score
+    return best
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return PatternMatcher(EMAIL_STRUCTURES)
+
+
+def test_exact_name(matcher):
+    assert matcher.match("contoso") == ("{first}_{last}@{domain}", "contoso.com")
+
+
+@pytest.mark.parametrize("name, score, matched", [
+    ("windtradersx", 79, False),
+    ("hwindtradersxy", 80, False),
+    ("windtraders", 81, True),
+])
+def test_threshold_is_strictly_above_80(matcher, name, score, matched):
+    assert fuzz.token_sort_ratio(name, "northwindtraders") == score
+    expected = EMAIL_STRUCTURES["northwindtraders"] if matched else None
+    assert matcher.match(name) == expected
+
+
+def test_ties_go_to_the_earlier_row(matcher):
+    name = "acmeholdingx"
+    assert fuzz.token_sort_ratio(name, "acmeholdings") == fuzz.token_sort_ratio(name, "acmeholdingz") > 80
+    assert matcher.match(name) == EMAIL_STRUCTURES["acmeholdings"]
+
+
+def test_unmatched_rows_are_never_targets(matcher):
+    assert matcher.match("fabrikam") is None
+
+
+def test_top_matches_ranks_by_score_then_position(matcher):
+    [ranked] = matcher.top_matches(["acmeholdingx"], limit=3)
+    assert [position for position, _ in ranked] == [1, 2]
+    assert ranked[0][1] == ranked[1][1]
+
+
+def test_match_many_agrees_with_reference_scan(matcher):
+    rnd = random.Random(0)
+    names = []
+    for organization in EMAIL_STRUCTURES:
+        for _ in range(40):
+            chars = list(organization)
+            for _ in range(rnd.randint(0, 4)):
+                position = rnd.randrange(len(chars))
+                operation = rnd.choice("drs")
+                if operation == "d" and len(chars) > 1:
+                    del chars[position]
+                elif operation == "r":
+                    chars[position] = rnd.choice("abcdefghijklmnopqrstuvwxyz")
+                else:
+                    chars.insert(position, rnd.choice("abcdefghijklmnopqrstuvwxyz"))
+            names.append("".join(chars))
+    names += ["", "x", "acme", "globex corporation"]
+    assert matcher.match_many(names) == [reference_match(name, EMAIL_STRUCTURES) for name in names]
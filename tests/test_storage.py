@@ -0,0 +1,36 @@
+from benchmarks.fakes import FakeWorksheet
+from email_generator import estimate_contact_count
+from storage import EXTRACT_HEADERS, LocalStorage, used_row_count
+
+
+def test_local_row_count_is_a_property_of_used_rows(tmp_path):
+    storage = LocalStorage(str(tmp_path / "tabs.sqlite3"))
+    try:
+        extract = storage.worksheet("Extract")
+        assert extract.row_count == 0
+        extract.append_rows([EXTRACT_HEADERS, ["Ann Lee", "Acme"], ["Bob Roy", "Globex"]])
+        assert extract.row_count == 3
+        assert used_row_count(extract) == 3
+        # Local tabs have no filler row under the header
+        assert estimate_contact_count(extract) == 2
+    finally:
+        storage.close()
+
+
+# gspread-like handles are sized from column A, not from their grid
+class SheetsLikeWorksheet(FakeWorksheet):
+    row_count = 1000
+
+    # Like gspread: empty cells inside the column are kept, trailing ones dropped
+    def col_values(self, column):
+        values = [row[column - 1] if len(row) >= column else "" for row in self.rows]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+
+def test_sheets_rows_are_counted_from_column_a():
+    extract = SheetsLikeWorksheet("Extract", [EXTRACT_HEADERS, [""], ["Ann Lee", "Acme"], ["Bob Roy", "Globex"]])
+    # Header, filler row and two contacts, whatever the grid size
+    assert used_row_count(extract) == 4
+    assert estimate_contact_count(extract) == 2
@@ -0,0 +1,221 @@
+import json
+import sqlite3
+import time
+from gspread.utils import rowcol_to_a1
+
+# Local file holding every verified address, mirrored from the History tab
+VERIFICATION_STORE_PATH = "verification_store.sqlite3"
+
+# Verdicts older than this are verified again
+VERIFICATION_TTL_DAYS = 90
+
+# Domain verdicts (catch-all, dead, webmail) older than this are probed again
+DOMAIN_VERDICT_TTL_DAYS = 30
+
+# Sheets every verified row is appended to
+RESULT_SHEETS = ("Validation", "History")
+
+
+# Indexed email -> (status, score, verified_at) store that replaces reading the
+# whole History tab on every run. sync_history only pulls the rows appended to
+# History since the previous sync.
+class VerificationStore:
+    def __init__(self, path=VERIFICATION_STORE_PATH, ttl_days=VERIFICATION_TTL_DAYS,
+                 domain_ttl_days=DOMAIN_VERDICT_TTL_DAYS):
+        self.ttl = ttl_days * 24 * 3600
+        self.domain_ttl = domain_ttl_days * 24 * 3600
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS verifications (
+                   email TEXT PRIMARY KEY,
+                   status TEXT,
+                   score TEXT,
+                   verified_at REAL NOT NULL
+               )"""
+        )
+        # Last History row already mirrored, plus its email to detect a cleared or edited sheet
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS sync_state (
+                   sheet TEXT PRIMARY KEY,
+                   last_row INTEGER NOT NULL,
+                   last_email TEXT
+               )"""
+        )
+        # Verified rows not yet appended to each results sheet, so an
+        # interrupted run can flush them instead of paying for them again
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS journal (
+                   email TEXT NOT NULL,
+                   sheet TEXT NOT NULL,
+                   row TEXT NOT NULL,
+                   PRIMARY KEY (email, sheet)
+               )"""
+        )
+        # Whole-domain verdicts learned from Hunter responses
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS domains (
+                   domain TEXT PRIMARY KEY,
+                   verdict TEXT NOT NULL,
+                   recorded_at REAL NOT NULL
+               )"""
+        )
+        # Name and company of each address whose latest History row is "valid",
+        # for pattern_learner. A store synced before this table existed reads
+        # History from the top once more to fill it.
+        if not self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'valid_contacts'").fetchone():
+            self.conn.execute(
+                """CREATE TABLE valid_contacts (
+                       email TEXT PRIMARY KEY,
+                       first_name TEXT NOT NULL,
+                       last_name TEXT NOT NULL,
+                       company TEXT NOT NULL
+                   )"""
+            )
+            self.conn.execute("DELETE FROM sync_state")
+        # Address pattern that last verified as valid at each domain
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS domain_patterns (
+                   domain TEXT PRIMARY KEY,
+                   pattern TEXT NOT NULL,
+                   learned_at REAL NOT NULL
+               )"""
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, email):
+        return self.conn.execute(
+            "SELECT status, score, verified_at FROM verifications WHERE email = ?", (email,)
+        ).fetchone()
+
+    # True if the address was verified within the TTL
+    def is_fresh(self, email):
+        row = self.get(email)
+        return row is not None and time.time() - row[2] < self.ttl
+
+    # Record fresh verdicts as (email, status, score) tuples
+    def record_many(self, entries):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO verifications VALUES (?, ?, ?, ?)",
+            [(email, status, str(score), now) for email, status, score in entries],
+        )
+        self.conn.commit()
+
+    # Unexpired verdict for a domain ("accept_all", "invalid_domain", "webmail") or None
+    def domain_verdict(self, domain):
+        row = self.conn.execute(
+            "SELECT verdict, recorded_at FROM domains WHERE domain = ?", (domain,)
+        ).fetchone()
+        if row is None or time.time() - row[1] >= self.domain_ttl:
+            return None
+        return row[0]
+
+    def record_domain_verdict(self, domain, verdict):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO domains VALUES (?, ?, ?)", (domain, verdict, time.time())
+        )
+        self.conn.commit()
+
+    # Pattern (e.g. "{first}.{last}@{domain}") known to work at a domain, or None
+    def learned_pattern(self, domain):
+        row = self.conn.execute(
+            "SELECT pattern FROM domain_patterns WHERE domain = ?", (domain,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def record_pattern(self, domain, pattern):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO domain_patterns VALUES (?, ?, ?)", (domain, pattern, time.time())
+        )
+        self.conn.commit()
+
+    # (first_name, last_name, email, company) of every address History holds as valid
+    def valid_contacts(self):
+        return self.conn.execute(
+            "SELECT first_name, last_name, email, company FROM valid_contacts ORDER BY rowid"
+        ).fetchall()
+
+    # Durably record one verified `row + [status, score]` before it reaches the sheets
+    def journal_result(self, email, row):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO verifications VALUES (?, ?, ?, ?)",
+            (email, row[-2], str(row[-1]), time.time()),
+        )
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO journal VALUES (?, ?, ?)",
+            [(email, sheet, json.dumps(row)) for sheet in RESULT_SHEETS],
+        )
+        self.conn.commit()
+
+    # (email, row) pairs still waiting to be appended to `sheet`, oldest first
+    def pending(self, sheet):
+        rows = self.conn.execute(
+            "SELECT email, row FROM journal WHERE sheet = ? ORDER BY rowid", (sheet,)
+        ).fetchall()
+        return [(email, json.loads(row)) for email, row in rows]
+
+    def mark_flushed(self, sheet, emails):
+        self.conn.executemany(
+            "DELETE FROM journal WHERE email = ? AND sheet = ?",
+            [(email, sheet) for email in emails],
+        )
+        self.conn.commit()
+
+    # Mirror History rows appended since the last sync; returns how many were read.
+    # History has no timestamp column, so rows first seen here count as verified now.
+    def sync_history(self, history_sheet, headers, sheet_name="History"):
+        email_index = headers.index("email")
+        status_index = headers.index("status")
+        score_index = headers.index("score")
+        contact_indexes = [headers.index(field) for field in ("first_name", "last_name", "current_company")]
+
+        state = self.conn.execute(
+            "SELECT last_row, last_email FROM sync_state WHERE sheet = ?", (sheet_name,)
+        ).fetchone()
+        last_row, last_email = state if state else (1, None)  # row 1 is the header
+
+        # Start over if the last synced row no longer holds the same address
+        if last_row > 1:
+            anchor = history_sheet.row_values(last_row)
+            anchor_email = (anchor[email_index].strip() or None) if len(anchor) > email_index else None
+            if anchor_email != last_email:
+                last_row, last_email = 1, None
+
+        last_column = rowcol_to_a1(1, len(headers))[:-1]
+        new_rows = history_sheet.get(f"A{last_row + 1}:{last_column}")
+
+        now = time.time()
+        entries = []
+        valid_contacts = {}  # email -> (first, last, company), or None if no longer valid
+        for row in new_rows:
+            if len(row) > email_index and row[email_index].strip():
+                email = row[email_index].strip()
+                status = row[status_index] if len(row) > status_index else ""
+                score = row[score_index] if len(row) > score_index else ""
+                entries.append((email, status, str(score), now))
+                valid_contacts[email] = (tuple(row[index] if len(row) > index else "" for index in contact_indexes)
+                                         if status == "valid" else None)
+                last_email = email
+            else:
+                last_email = None
+        # Keep the original verified_at for addresses already known
+        self.conn.executemany(
+            """INSERT INTO verifications VALUES (?, ?, ?, ?)
+               ON CONFLICT(email) DO UPDATE SET status = excluded.status, score = excluded.score""",
+            entries,
+        )
+        self.conn.executemany("DELETE FROM valid_contacts WHERE email = ?",
+                              [(email,) for email, contact in valid_contacts.items() if contact is None])
+        self.conn.executemany("INSERT OR REPLACE INTO valid_contacts VALUES (?, ?, ?, ?)",
+                              [(email,) + contact for email, contact in valid_contacts.items() if contact])
+        if new_rows:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (sheet_name, last_row + len(new_rows), last_email),
+            )
+        self.conn.commit()
+        return len(new_rows)